@@ -5,17 +5,20 @@ from __future__ import division, print_function, absolute_import, \
 from datetime import datetime, timedelta
 import sys
 import os.path
-from os import listdir
-from glob import glob
-from uuid import uuid4
 import codecs
 from collections import namedtuple
-import arrow
-import yaml
-import numpy as np
+from collections.abc import Mapping, MutableMapping
 import functools as ft
+# numpy, yaml and arrow are imported where they are used, so that
+# `import bark` (and every console script) starts quickly
 
 BUFFER_SIZE = 10000
+WRITE_BLOCK_BYTES = 2**24  # sampled data copied at a time by write_sampled
+EVENT_BATCH_SIZE = 65536  # rows buffered by an EventWriter
+TIMESTAMP_CACHE_SIZE = 65536  # parsed timestamp strings to remember
+INTERLEAVED = 'interleaved'  # sampled data layouts, see write_sampled
+_FOREIGN_ATTRS = ('data_file', 'byte_offset', 'byte_count')  # read_sampled
+CHANNEL_MAJOR = 'channel-major'
 
 spec_version = "0.2"
 __version__ = "0.2"
@@ -42,6 +45,18 @@ DATATYPES = _dt(name_to_code={name: code
                 code_to_name={code: name
                               for name, code in _pairs})
 
+
+def _yaml_loader():
+    "The libyaml C loader when PyYAML was built with it, else the Python one."
+    import yaml
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def _yaml_dumper():
+    "The libyaml C dumper when PyYAML was built with it, else the Python one."
+    import yaml
+    return getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
                 
 
 class LazyDict(dict):
@@ -58,17 +73,245 @@ class LazyDict(dict):
         return value
 
 
+class CachedDict(dict):
+    """Like `LazyDict`, but the results are held by a shared `DatasetCache`.
+
+    Values are functions, stored under `prefix/key` in the cache when called.
+    A value that has been evicted from the cache is loaded again on the next
+    access, so at most the cache's limits are kept in memory.
+    """
+    def __init__(self, cache, prefix, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.cache = cache
+        self.prefix = prefix
+
+    def __getitem__(self, item):
+        value = dict.__getitem__(self, item)
+        if callable(value):
+            value = self.cache.get(os.path.join(self.prefix, item), value)
+        return value
+
+
+class _Missing():
+    "Marks a field that a column does not have."
+    def __reduce__(self):
+        return '_MISSING'  # unpickles to the same object
+
+    def __repr__(self):
+        return '<missing>'
+
+
+_MISSING = _Missing()
+
+
+class _ColumnView(MutableMapping):
+    "The attributes of one column of a `Columns` table, as a dictionary."
+    __slots__ = ('_table', '_pos')
+
+    def __init__(self, table, pos):
+        self._table = table
+        self._pos = pos
+
+    def __getitem__(self, field):
+        value = self._table.fields[field][self._pos]
+        if value is _MISSING:
+            raise KeyError(field)
+        return value
+
+    def __setitem__(self, field, value):
+        fields = self._table.fields
+        if field not in fields:
+            fields[field] = [_MISSING] * len(self._table)
+        fields[field][self._pos] = value
+
+    def __delitem__(self, field):
+        self[field]  # raises KeyError if missing
+        self._table.fields[field][self._pos] = _MISSING
+
+    def __iter__(self):
+        return (f for f, values in self._table.fields.items()
+                if values[self._pos] is not _MISSING)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def copy(self):
+        return dict(self)
+
+
+class Columns(MutableMapping):
+    """Column metadata stored as a table, with one list per field.
+    
+    A drop-in replacement for the usual dictionary of column dictionaries
+    (``columns[0]['units']``) that avoids creating a dictionary per column.
+    Indexing returns a view of that column's attributes, backed by the
+    field lists. Datasets with hundreds of channels read, write and split
+    their metadata much faster in this form.
+    
+    In a meta file, the table is stored as a mapping with an `index` list of
+    column keys and a `fields` mapping of attribute name to list of values.
+    
+    Args:
+        index (sequence): column keys, in order
+        fields (dict): attribute name -> sequence of values, one per column
+    """
+    def __init__(self, index=(), fields=None):
+        self.index = list(index)
+        self.fields = {f: list(values)
+                       for f, values in (fields or {}).items()}
+        self._positions = None
+
+    @classmethod
+    def from_dict(cls, columns):
+        "Builds a table from a dictionary of column dictionaries."
+        table = cls(columns)
+        for pos, attrs in enumerate(columns.values()):
+            view = _ColumnView(table, pos)
+            for field, value in attrs.items():
+                view[field] = value
+        return table
+
+    @classmethod
+    def concat(cls, *tables):
+        """Joins tables end to end, renumbering the columns from 0.
+        
+        Args:
+            *tables (Columns): tables to join, in order
+        """
+        n_total = sum(len(t) for t in tables)
+        fields = {}
+        start = 0
+        for t in tables:
+            for field, values in t.fields.items():
+                if field not in fields:
+                    fields[field] = [_MISSING] * n_total
+                fields[field][start:start + len(t)] = values
+            start += len(t)
+        return cls(range(n_total), fields)
+
+    def take(self, keys):
+        """Selects columns by key, renumbering them from 0.
+        
+        Args:
+            keys (sequence): keys of the columns to keep, in the new order
+        
+        Returns:
+            Columns: a new table
+        """
+        positions = [self._position(k) for k in keys]
+        return Columns(range(len(positions)),
+                       {f: [values[i] for i in positions]
+                        for f, values in self.fields.items()})
+
+    def encode(self):
+        """Returns a representation suitable for YAML.
+        
+        Tables in which every column has every field are written in the
+        compact form; otherwise as a dictionary of dictionaries.
+        """
+        if any(v is _MISSING
+               for values in self.fields.values() for v in values):
+            return {k: dict(self[k]) for k in self.index}
+        return {'index': list(self.index),
+                'fields': {f: list(v) for f, v in self.fields.items()}}
+
+    @staticmethod
+    def is_encoded(columns):
+        "True if `columns` is the compact form produced by `encode`."
+        return (isinstance(columns, dict) and
+                set(columns) == {'index', 'fields'} and
+                isinstance(columns['index'], list))
+
+    def copy(self):
+        return Columns(self.index, self.fields)
+
+    def _position(self, key):
+        if self._positions is None:
+            self._positions = {k: i for i, k in enumerate(self.index)}
+        return self._positions[key]
+
+    def __getitem__(self, key):
+        return _ColumnView(self, self._position(key))
+
+    def __setitem__(self, key, attrs):
+        if key not in self:
+            self.index.append(key)
+            self._positions = None
+            for values in self.fields.values():
+                values.append(_MISSING)
+        view = self[key]
+        for field in list(view):
+            del view[field]
+        for field, value in attrs.items():
+            view[field] = value
+
+    def __delitem__(self, key):
+        pos = self._position(key)
+        del self.index[pos]
+        for values in self.fields.values():
+            del values[pos]
+        self._positions = None
+
+    def __contains__(self, key):
+        try:
+            self._position(key)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __repr__(self):
+        return 'Columns({!r})'.format({k: dict(self[k]) for k in self.index})
+
+
 # hierarchical classes
 class Root():
-    def __init__(self, path):
+    def __init__(self, path, index=False, workers=None, cache=None):
         self.path = os.path.abspath(path)
         self.name = os.path.split(self.path)[-1]
-        all_sub = [os.path.join(path, x) for x in listdir(self.path)]
-        subdirs = [x for x in all_sub if os.path.isdir(x) and x[-1] != '.']
+        # an optional persistent cache of metadata, see bark.index
+        if index is True:
+            from bark.index import MetaIndex
+            index = MetaIndex(self.path)
+        elif index is False:
+            index = None
+        self.index = index
+        # an optional bound on the datasets kept in memory, see bark.cache
+        if cache is True:
+            from bark.cache import DatasetCache
+            cache = DatasetCache()
+        elif cache is False:
+            cache = None
+        self.cache = cache
+        self.workers = workers
+        self._time_index = None
+        if self.index is None:
+            subdirs = _list_subdirs(self.path)
+        else:
+            subdirs = self.index.get(self.path,
+                                     ft.partial(_list_subdirs, self.path))
         # entries are lazily loaded by creating a dictionary
         # with the entry name and a function, that when called
         # loads the data. See the custom LazyDict data structure
-        self.entries = LazyDict({os.path.split(x)[-1]: ft.partial(read_entry, name=x) for x in subdirs})
+        self.entries = LazyDict({x: ft.partial(read_entry,
+                                               name=os.path.join(self.path, x),
+                                               index=self.index,
+                                               cache=self.cache)
+                                 for x in subdirs})
+        if workers:
+            # eagerly load every entry, and the metadata of its datasets
+            names = list(self.entries)
+            loaders = [dict.__getitem__(self.entries, x) for x in names]
+            entries = _thread_map(lambda f: f(preload=True), loaders, workers)
+            self.entries.update(zip(names, entries))
 
     def __getitem__(self, item):
         return self.entries[item]
@@ -79,6 +322,75 @@ class Root():
     def __contains__(self, item):
         return self.entries.__contains__(item)
 
+    @property
+    def time_index(self):
+        """The `TimeIndex` of the entries' start and end times.
+
+        Built on first use from the entries' metadata and the sizes of their
+        sampled datasets; no data is read.
+        """
+        if self._time_index is None:
+            names = list(self.entries)
+            paths = [os.path.join(self.path, x) for x in names]
+            span = ft.partial(_entry_span, index=self.index)
+            if self.workers:
+                spans = _thread_map(span, paths, self.workers)
+            else:
+                spans = [span(x) for x in paths]
+            self._time_index = TimeIndex(names, spans)
+        return self._time_index
+
+    def query(self, start, stop):
+        """Finds the entries that overlap a time range.
+
+        Args:
+            start: beginning of the range; see :meth:`timestamp_to_datetime`
+                for allowed types. Naive times are in the default timezone of
+                :meth:`convert_timestamp`.
+            stop: end of the range, same types as `start`
+
+        Returns:
+            list: the overlapping Entry objects, ordered by start time
+        """
+        names = self.time_index.overlapping(_posix_time(start),
+                                            _posix_time(stop))
+        return [self.entries[x] for x in names]
+
+
+class TimeIndex():
+    """An interval index of entry start and end times.
+
+    Args:
+        names (list): entry names
+        spans (list): (start, duration) of each entry, in POSIX seconds and
+            seconds
+
+    Entries are kept sorted by start time. Since no entry is longer than the
+    longest one, only those starting within that duration before a query can
+    overlap it, and they are found by binary search.
+    """
+    def __init__(self, names, spans):
+        order = sorted(range(len(names)), key=lambda i: spans[i][0])
+        self.names = [names[i] for i in order]
+        self.starts = [spans[i][0] for i in order]
+        self.stops = [spans[i][0] + spans[i][1] for i in order]
+        self.max_duration = max([d for _, d in spans] or [0])
+
+    def __len__(self):
+        return len(self.names)
+
+    def overlapping(self, start, stop):
+        """Names of the entries overlapping [start, stop), in POSIX seconds.
+
+        An entry without sampled data (of zero duration) overlaps a range
+        that contains its start time.
+        """
+        from bisect import bisect_left
+        lo = bisect_left(self.starts, start - self.max_duration)
+        hi = bisect_left(self.starts, stop)
+        return [self.names[i] for i in range(lo, hi)
+                if self.stops[i] > start or self.starts[i] >= start]
+
 
 class Entry():
     def __init__(self, datasets, path, attrs):
@@ -129,6 +441,128 @@ class SampledData(Data):
         super().__init__(*args, **kwargs)
         self.sampling_rate = self.attrs['sampling_rate']
 
+    @property
+    def offset(self):
+        "Start of the dataset relative to the entry, in samples."
+        return self.attrs.get('offset', 0)
+
+    @property
+    def data_path(self):
+        "The file holding the samples, usually the dataset's own path."
+        return _data_path(self.path, self.attrs)
+
+    @property
+    def data_mtime(self):
+        """Modification time of the samples. For a virtual dataset, this is
+        the newest of its members' times, as its own file is a placeholder.
+        """
+        if self.attrs.get('members'):
+            return max(member.data_mtime for member in self.data.members)
+        return os.path.getmtime(self.data_path)
+
+    def _sample(self, t):
+        "Index of the sample at time `t`, clipped to the dataset."
+        i = int(round(t * self.sampling_rate)) - self.offset
+        return min(max(i, 0), self.data.shape[0])
+
+    def time_slice(self, t0, t1, channels=None):
+        """Returns the samples between two times, without copying.
+
+        Args:
+            t0 (float): start time, in seconds from the start of the entry
+            t1 (float): stop time, in seconds, exclusive
+            channels: optional channel index or slice; a sequence of
+                channels is allowed, but returns a copy
+
+        Returns:
+            numpy.ndarray: a view of the data, clipped to the dataset
+        """
+        view = self.data[self._sample(t0):self._sample(t1)]
+        if channels is not None:
+            view = view[:, channels]
+        return view
+
+    def window(self, t, duration, channels=None):
+        """Like :meth:`time_slice`, but by start time and duration.
+
+        The window always has the same number of samples for a given
+        `duration`, unless it is clipped by the ends of the dataset.
+        """
+        i = int(round(t * self.sampling_rate)) - self.offset
+        n = int(round(duration * self.sampling_rate))
+        view = self.data[max(i, 0):max(i + n, 0)]
+        if channels is not None:
+            view = view[:, channels]
+        return view
+
+    def windows(self, starts, duration, channels=None):
+        """Returns many equal length windows as one array.
+
+        Args:
+            starts (sequence of float): window start times, in seconds
+            duration (float): window length, in seconds
+            channels: optional channel index or slice
+
+        Returns:
+            numpy.ndarray: array of shape (windows, samples, channels). When
+            the starts are equally spaced in samples, and the data is not
+            compressed, this is a read-only strided view of the data,
+            otherwise it is a copy.
+
+        Raises:
+            IndexError: if a window does not fit inside the dataset
+        """
+        import numpy as np
+        from numpy.lib.stride_tricks import as_strided
+        data = self.data
+        idx = (np.round(np.asarray(starts, dtype=float) *
+                        self.sampling_rate).astype(np.int64) - self.offset)
+        n = int(round(duration * self.sampling_rate))
+        if len(idx) and (idx.min() < 0 or idx.max() + n > data.shape[0]):
+            raise IndexError('window outside of dataset {}'.format(self.path))
+        steps = np.diff(idx)
+        if not isinstance(data, np.ndarray):  # e.g. a CompressedArray
+            result = np.empty((len(idx), n, data.shape[1]), data.dtype)
+            for i, start in enumerate(idx):
+                result[i] = data[start:start + n]
+        elif len(idx) and np.all(steps == steps[:1]):
+            step = int(steps[0]) if len(steps) else 0
+            row, col = data.strides
+            result = as_strided(data[idx[0]:],
+                                shape=(len(idx), n, data.shape[1]),
+                                strides=(step * row, row, col),
+                                writeable=False)
+        else:
+            result = data[idx[:, np.newaxis] + np.arange(n)]
+        if channels is not None:
+            result = result[:, :, channels]
+        return result
+
+    def stats(self, save=True):
+        """Returns the summary statistics of the dataset.
+
+        Args:
+            save (bool): if `True`, keep the statistics in a sidecar file, so
+                they are computed only once
+
+        Returns:
+            bark.stats.SampledStats: per-channel means, standard deviations
+            and extremes of any range of samples, and amplitude histograms
+        """
+        from bark.stats import read_stats
+        return read_stats(self, save)
+
+    def pyramid(self):
+        """Returns the min/max pyramid of the dataset, for drawing it.
+
+        The pyramid is built on first use and kept in a sidecar file.
+
+        Returns:
+            bark.pyramid.MinMaxPyramid: see its `envelope` method
+        """
+        from bark.pyramid import read_pyramid
+        return read_pyramid(self)
+
     def toStream(self):
         from bark import stream
         return stream.read(self.path)
@@ -140,22 +574,439 @@ class SampledData(Data):
 
 
 class EventData(Data):
+    _order = None  # sorted start times and row order, see _sorted
+
     def write(self, path=None):
         "Saves data to file"
         if path is None:
             path = self.path
         write_events(path, self.data, **self.attrs)
 
+    @property
+    def _index_path(self):
+        return self.path + '.order.npy'
+
+    def _sorted(self):
+        """Returns the start times in order, the order of the rows, and the
+        longest interval.
+
+        The order is `None` if the events are already sorted. It is computed
+        on first use, or read from the sidecar written by :meth:`save_index`
+        if that is newer than the data file.
+        """
+        import numpy as np
+        if self._order is None or len(self._order[0]) != len(self.data):
+            starts = np.asarray(self.data['start'], dtype=float)
+            order = None
+            if np.any(starts[1:] < starts[:-1]):
+                order = self._load_index(len(starts))
+                if order is None:
+                    order = np.argsort(starts, kind='mergesort')
+            longest = 0
+            if 'stop' in self.data and len(starts):
+                longest = np.nanmax(np.asarray(self.data['stop'],
+                                               dtype=float) - starts)
+            if order is not None:
+                starts = starts[order]
+            self._order = (starts, order, longest)
+        return self._order
+
+    def _load_index(self, n):
+        import numpy as np
+        try:
+            if (os.stat(self._index_path).st_mtime_ns <
+                    os.stat(self.path).st_mtime_ns):
+                return None
+            order = np.load(self._index_path)
+        except (OSError, ValueError):
+            return None
+        return order if len(order) == n else None
+
+    def save_index(self):
+        """Saves the sort order of the events next to the data file.
+
+        Reopened datasets then skip sorting. Nothing is saved if the events
+        are already in order.
+        """
+        import numpy as np
+        order = self._sorted()[1]
+        if order is not None:
+            with open(self._index_path, 'wb') as fp:
+                np.save(fp, order)
+
+    def between(self, t0, t1, overlap=False):
+        """Returns the events that start between two times, inclusive.
+
+        Args:
+            t0 (float): earliest start time
+            t1 (float): latest start time
+            overlap (bool): if `True`, also include intervals that start
+                before `t0` but stop at or after it
+
+        Returns:
+            DataFrame: the events, ordered by start time
+        """
+        return self.between_many([t0], [t1], overlap)[0]
+
+    def between_many(self, t0s, t1s, overlap=False):
+        """Like :meth:`between`, for many time windows at once.
+
+        Args:
+            t0s (sequence of float): earliest start time of each window
+            t1s (sequence of float): latest start time of each window
+            overlap (bool): see :meth:`between`
+
+        Returns:
+            list: a DataFrame for each window
+        """
+        import numpy as np
+        starts, order, longest = self._sorted()
+        t0s = np.asarray(t0s, dtype=float)
+        if overlap:
+            los = np.searchsorted(starts, t0s - longest, 'left')
+        else:
+            los = np.searchsorted(starts, t0s, 'left')
+        his = np.searchsorted(starts, t1s, 'right')
+        result = []
+        for t0, lo, hi in zip(t0s, los, his):
+            rows = slice(lo, hi) if order is None else order[lo:hi]
+            events = self.data.iloc[rows]
+            if overlap:
+                events = events[(events['start'] >= t0) |
+                                (events['stop'] >= t0)]
+            result.append(events)
+        return result
+
+
+class SampledWriter():
+    """Writes a sampled dataset incrementally, one block of samples at a time.
+
+    Args:
+        datfile (str): path to file to write to
+        sampling_rate (int or float): sampling rate of the data
+        dtype: data type of the file; if `None`, that of the first block.
+            Blocks of another type are converted.
+        append (bool): if `True` and `datfile` exists, add samples to the end
+            of it. Its metadata is kept, updated by `params`.
+        **params: all other keyword arguments are treated as dataset
+            attributes, and added to the meta file
+
+    Samples are written interleaved; for the channel-major layout, which
+    needs the number of samples in advance, see :func:`write_sampled`.
+    The meta file is written by :meth:`close`, which also returns the finished
+    dataset. Used as a context manager, the writer is closed on exit; if the
+    block raised an exception, no meta file is written.
+
+    Example:
+        with bark.SampledWriter('mic.dat', 30000) as writer:
+            for block in blocks:
+                writer.write(block)
+    """
+    def __init__(self, datfile, sampling_rate, dtype=None, append=False,
+                 **params):
+        import numpy as np
+        self.path = datfile
+        self.attrs = {}
+        if append and os.path.exists(datfile):
+            self.attrs = read_metadata(datfile)
+            if 'data_file' in self.attrs or 'byte_offset' in self.attrs:
+                raise ValueError('cannot append to {}, whose samples are in '
+                                 'a foreign file'.format(datfile))
+            if dtype is None:
+                dtype = self.attrs['dtype']
+            elif np.dtype(dtype) != np.dtype(self.attrs['dtype']):
+                raise ValueError('cannot append {} data to {} file {}'.format(
+                    dtype, self.attrs['dtype'], datfile))
+        self.attrs.update(params)
+        if self.attrs.get('layout', INTERLEAVED) != INTERLEAVED:
+            raise ValueError('cannot write {} layout incrementally to '
+                             '{}'.format(self.attrs['layout'], datfile))
+        self.attrs['sampling_rate'] = sampling_rate
+        self.dtype = dtype
+        self.n_samples = 0
+        self._fp = open(datfile, 'ab' if append else 'wb')
+
+    def write(self, data):
+        """Appends samples to the file.
+
+        Args:
+            data (array): block of samples, of at most 2 dimensions
+
+        Raises:
+            ValueError: if the block's channels do not match the dataset's
+        """
+        import numpy as np
+        data = np.asarray(data)
+        if self.dtype is None:
+            self.dtype = data.dtype
+        if 'columns' not in self.attrs:
+            self.attrs['columns'] = sampled_columns(data)
+        else:  # a block of other channels would corrupt the file
+            sampled_columns(data, self.attrs['columns'])
+        self._fp.write(np.ascontiguousarray(data, dtype=self.dtype).tobytes())
+        self.n_samples += data.shape[0]
+
+    def close(self):
+        """Closes the file and writes the meta file.
+
+        Returns:
+            SampledData: the written dataset
+        """
+        import numpy as np
+        if not self._fp.closed:
+            self._fp.close()
+            if self.dtype is None:
+                raise ValueError('no data was written to {}, and no dtype '
+                                 'was given'.format(self.path))
+            self.attrs['dtype'] = np.dtype(self.dtype).str
+            write_metadata(self.path, **self.attrs)
+        return read_sampled(self.path, attrs=self.attrs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._fp.close()
+
 
-def template_columns(fields):
+class EventWriter():
+    """Writes an event dataset incrementally, in batches of rows.
+
+    Args:
+        eventsfile (str): path to file to write to
+        fields (sequence of str): column names, in file order; if `None`,
+            taken from the first rows written, or from `columns`
+        format (str): 'csv' or 'npy', see :func:`write_events`
+        append (bool): if `True` and `eventsfile` exists, add rows to the end
+            of it. Its metadata is kept, updated by `params`. Only CSV files
+            can be appended to.
+        batch_size (int): number of rows buffered before they are written
+        **params: all other keyword arguments are treated as dataset
+            attributes, and added to the meta file
+
+    Rows are buffered by column and written in bulk; the meta file is written
+    once, by :meth:`close`. Used as a context manager, the writer is closed on
+    exit; if the block raised an exception, no meta file is written.
+
+    In the npy format, a column's type is its `dtype` column attribute if
+    there is one, float64 for times in seconds, else that of the first batch.
+    String columns are stored as int32 codes.
+
+    Example:
+        with bark.EventWriter('spikes.csv', fields=('channel', 'start'),
+                              columns=columns) as writer:
+            for channel, time in spikes:
+                writer.writerow((channel, time))
+    """
+    def __init__(self, eventsfile, fields=None, format='csv', append=False,
+                 batch_size=EVENT_BATCH_SIZE, **params):
+        self.path = eventsfile
+        self.attrs = {}
+        self.n_rows = 0
+        self.batch_size = batch_size
+        self._header = True
+        if append and os.path.exists(eventsfile):
+            self.attrs = read_metadata(eventsfile)
+            format = self.attrs.get('format', 'csv')
+            if format != 'csv':
+                raise ValueError('cannot append to {} file {}'.format(
+                    format, eventsfile))
+            with open(eventsfile, 'r') as fp:
+                header = fp.readline().strip()
+            if header:
+                fields = header.split(',')
+                self._header = False
+        else:
+            append = False
+        if format not in ('csv', 'npy'):
+            raise ValueError('unknown event format: {}'.format(format))
+        params.pop('format', None)
+        self.attrs.update(params)
+        self.format = format
+        self.fields = None if fields is None else list(fields)
+        self._batch = None
+        self._dtypes = None
+        self._categories = {}
+        if format == 'npy':
+            self._fp = open(eventsfile, 'wb')
+            self._fp.write(b' ' * _NPY_HEADER_SIZE)  # filled in on close
+        else:
+            self._fp = open(eventsfile, 'a' if append else 'w')
+
+    def _start(self, fields):
+        self.fields = list(fields)
+        self._batch = {x: [] for x in self.fields}
+
+    def writerow(self, row):
+        """Adds one event.
+
+        Args:
+            row: a mapping from field to value, or a sequence of values in
+                the order of `fields`
+        """
+        if self._batch is None:
+            if self.fields is None and not isinstance(row, Mapping):
+                raise ValueError('fields are needed to write sequences')
+            self._start(row if self.fields is None else self.fields)
+        if isinstance(row, Mapping):
+            for field in self.fields:
+                self._batch[field].append(row[field])
+        else:
+            for field, value in zip(self.fields, row):
+                self._batch[field].append(value)
+        if len(self._batch[self.fields[0]]) >= self.batch_size:
+            self.flush()
+
+    def writerows(self, rows):
+        "Adds each of a sequence of events, see :meth:`writerow`."
+        for row in rows:
+            self.writerow(row)
+
+    def write(self, data):
+        """Adds many events at once.
+
+        Args:
+            data: a DataFrame, or a mapping from field to a sequence of values
+        """
+        import pandas as pd
+        if self._batch is None:
+            self._start(data if self.fields is None else self.fields)
+        self.flush()
+        self._write(pd.DataFrame(data, columns=self.fields))
+
+    def flush(self):
+        "Writes the buffered events to the file."
+        import pandas as pd
+        if self._batch and len(self._batch[self.fields[0]]):
+            self._write(pd.DataFrame(self._batch, columns=self.fields))
+            self._batch = {x: [] for x in self.fields}
+
+    def _write(self, frame):
+        if self.format == 'csv':
+            frame.to_csv(self._fp, header=self._header, index=False)
+            self._header = False
+        else:
+            self._fp.write(self._records(frame).tobytes())
+        self.n_rows += len(frame)
+
+    def _records(self, frame):
+        "Converts a batch to the structured array of the npy format."
+        import numpy as np
+        import pandas as pd
+        if self._dtypes is None:
+            declared = _event_dtypes(self.attrs.get('columns', {}))
+            self._dtypes = []
+            for name in self.fields:
+                values = frame[name]
+                if name in declared and declared[name] in ('category', 'str'):
+                    dtype = np.dtype(object)
+                elif name in declared:
+                    dtype = np.dtype(declared[name])
+                elif (pd.api.types.is_numeric_dtype(values) or
+                      pd.api.types.is_bool_dtype(values)):
+                    dtype = np.asarray(values).dtype
+                else:
+                    dtype = np.dtype(object)
+                if dtype == object:
+                    self._categories[name] = {}
+                    dtype = np.dtype(np.int32)
+                self._dtypes.append((str(name), dtype))
+        records = np.empty(len(frame), dtype=self._dtypes)
+        for name, _ in self._dtypes:
+            values = frame[name]
+            if name in self._categories:
+                # codes of this batch, mapped to codes of the whole file
+                codes, uniques = pd.factorize(
+                    values.astype(object).fillna('').astype(str))
+                categories = self._categories[name]
+                ids = [categories.setdefault(x, len(categories))
+                       for x in uniques]
+                values = np.asarray(ids, dtype=np.int32)[codes]
+            records[name] = values
+        return records
+
+    def close(self):
+        "Writes any buffered events, closes the file and writes the meta file."
+        import numpy as np
+        if self._fp.closed:
+            return
+        if self._batch is None:
+            self._start(self.fields if self.fields is not None else
+                        self.attrs.get('columns', ()))
+        if self.format == 'npy' and self._dtypes is None:
+            # no events: make a typed, empty array
+            self._records(self._empty_frame())
+        if self._header and self.format == 'csv':
+            self._write(self._empty_frame())
+        self.flush()
+        if self.format == 'npy':
+            self._fp.seek(0)
+            self._fp.write(_npy_header(np.dtype(self._dtypes), self.n_rows))
+        self._fp.close()
+        if 'columns' not in self.attrs:
+            self.attrs['columns'] = template_columns(self.fields)
+        elif self.format == 'npy':
+            self.attrs['columns'] = _strip_categories(self.attrs['columns'])
+        if self.format == 'npy':
+            self.attrs['format'] = self.format
+            columns = self.attrs['columns'] = {
+                k: dict(v) for k, v in self.attrs['columns'].items()}
+            for name, categories in self._categories.items():
+                columns.setdefault(name, {'units': None})
+                columns[name]['categories'] = list(categories)
+        write_metadata(self.path, **self.attrs)
+
+    def _empty_frame(self):
+        import pandas as pd
+        return pd.DataFrame({x: [] for x in self.fields}, columns=self.fields)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._fp.close()
+
+
+_NPY_HEADER_SIZE = 4096  # room for the header of a streamed npy file
+
+
+def _npy_header(dtype, n_rows, size=_NPY_HEADER_SIZE):
+    """The header of a version 1.0 npy file, padded to `size` bytes.
+    
+    Raises:
+        ValueError: if the header does not fit
+    """
+    import struct
+    from numpy.lib.format import dtype_to_descr, magic
+    header = repr({'descr': dtype_to_descr(dtype), 'fortran_order': False,
+                   'shape': (n_rows, )})
+    prefix = magic(1, 0)
+    length = size - len(prefix) - 2
+    if len(header) + 1 > length or length > 65535:
+        raise ValueError('npy header does not fit in {} bytes'.format(size))
+    return (prefix + struct.pack('<H', length) +
+            (header.ljust(length - 1) + '\n').encode('latin1'))
+
+
+def template_columns(fields, compact=False):
     """Produces a template columns dict for use in a meta file.
     
     Args:
         fields (sequence of str): sequence of column names
+        compact (bool): if `True`, return a :class:`Columns` table instead
        
     Returns:
         dict: minimal template columns dictionary
     """
+    if compact:
+        fields = list(fields)
+        return Columns(fields, {'units': [None] * len(fields)})
     return {f: {'units': None} for f in fields}
 
 
@@ -182,7 +1033,7 @@ def event_columns(dataframe, columns=None):
             columns[col]['units'] = None
 
 
-def sampled_columns(data, columns=None):
+def sampled_columns(data, columns=None, compact=False):
     """Produces a columns dict for sampled data, for use in a meta file.
     
     If `columns` is `None`, create new columns dict; otherwise, verify columns.
@@ -191,6 +1042,7 @@ def sampled_columns(data, columns=None):
         data (sequence): time series data of at most 2 dimensions
         columns (dict): existing columns dict to bring into
             register with shape of `data`
+        compact (bool): if `True`, new columns are a :class:`Columns` table
     
     Returns:
         dict, or None: Columns dictionary for `data`
@@ -198,12 +1050,9 @@ def sampled_columns(data, columns=None):
     Raises:
         ValueError: if the keys in `columns` don't match up with `data`
     """
-    if len(data.shape) == 1:
-        n_channels = 1
-    else:
-        n_channels = data.shape[1]
+    n_channels = _n_columns(data)
     if columns is None:
-        return template_columns(range(n_channels))
+        return template_columns(range(n_channels), compact)
     if len(columns) != n_channels:
         raise ValueError(
             'the columns attribute does not match the number of columns')
@@ -215,114 +1064,363 @@ def sampled_columns(data, columns=None):
             columns[i]['units'] = None
 
 
-def write_sampled(datfile, data, sampling_rate, **params):
+def write_sampled(datfile, data, sampling_rate, compression=None, layout=None,
+                  **params):
     """Writes a sampled dataset to disk as a raw binary file, plus a meta file.
     
     Args:
         datfile (str): path to file to write to. If the file exists, it is
             overwritten.
-        data (sequence): time series data of at most 2 dimensions
+        data: time series data of at most 2 dimensions. Either an array, or
+            any object with `shape` and `dtype` that can be sliced (such as
+            an h5py dataset), or an iterator of blocks of samples (such as a
+            :class:`bark.stream.Stream`). Large arrays and iterators are
+            copied a block at a time, so they are never entirely in memory.
         sampling_rate (int or float): sampling rate of `data`
+        compression: if given, write a compressed dataset with this codec,
+            'zlib', 'lzma' or 'bz2'; or a dictionary of arguments to
+            :class:`bark.compressed.CompressedWriter`, such as the
+            `compression` attribute of another compressed dataset
+        layout (str): order of the samples in the file, 'interleaved' (the
+            default), or 'channel-major' to store each channel contiguously,
+            which is faster for reading one channel at a time. Ignored for
+            compressed datasets, whose blocks are always channel-major.
         **params: all other keyword arguments are treated as dataset attributes,
             and added to the meta file
     
     Returns:
         SampledData: sampled dataset containing `data`
+
+    Raises:
+        ValueError: if `layout` is unknown
     """
-    if 'columns' not in params:
-        params['columns'] = sampled_columns(data)
-    params["dtype"] = data.dtype.str
-    shape = data.shape
-    mdata = np.memmap(datfile, dtype=params["dtype"], mode="w+", shape=shape)
-    mdata[:] = data[:]
-    write_metadata(datfile, sampling_rate=sampling_rate, **params)
+    if hasattr(data, 'shape') and hasattr(data, 'dtype'):
+        if 'columns' not in params:
+            params['columns'] = sampled_columns(data)
+        row_bytes = max(data.dtype.itemsize * _n_columns(data), 1)
+        block = max(WRITE_BLOCK_BYTES // row_bytes, 1)
+        blocks = (data[i:i + block] for i in range(0, data.shape[0], block))
+        dtype = data.dtype
+    else:
+        blocks = data
+        dtype = None
+    params.pop('dtype', None)
+    params.pop('members', None)  # the data of a virtual dataset is copied
+    for name in _FOREIGN_ATTRS:  # and so is data in a foreign file
+        params.pop(name, None)
+    if compression is None and layout not in (None, INTERLEAVED):
+        return _write_channel_major(datfile, data, sampling_rate, layout,
+                                    **params)
+    if compression is None:
+        writer = SampledWriter(datfile, sampling_rate, dtype, **params)
+    else:
+        from bark.compressed import CompressedWriter
+        if not isinstance(compression, Mapping):
+            compression = {'codec': compression}
+        params.update(compression)
+        writer = CompressedWriter(datfile, sampling_rate, dtype, **params)
+    with writer:
+        for x in blocks:
+            writer.write(x)
+    mode = 'r+' if compression is None else 'r'
+    return read_sampled(datfile, mode=mode, attrs=writer.attrs)
+
+
+def _write_channel_major(datfile, data, sampling_rate, layout, **params):
+    "Writes sampled data one channel after another, see `write_sampled`."
+    import numpy as np
+    if layout != CHANNEL_MAJOR:
+        raise ValueError('unknown layout: {}'.format(layout))
+    if not hasattr(data, 'shape'):
+        # an iterator: the number of samples is not known until the end, so
+        # write it interleaved first
+        tmpfile = datfile + '.tmp'
+        try:
+            source = write_sampled(tmpfile, data, sampling_rate, **params)
+            params['columns'] = source.attrs['columns']
+            dset = _write_channel_major(datfile, source.data, sampling_rate,
+                                        layout, **params)
+        finally:
+            for name in (tmpfile, tmpfile + '.meta.yaml'):
+                if os.path.exists(name):
+                    os.remove(name)
+        return dset
+    n_samples, n_columns = data.shape[0], _n_columns(data)
+    if n_samples == 0:
+        open(datfile, 'wb').close()
+    else:
+        out = np.memmap(datfile, dtype=data.dtype, mode='w+',
+                        shape=(n_columns, n_samples))
+        block = max(WRITE_BLOCK_BYTES // max(data.dtype.itemsize * n_columns,
+                                             1), 1)
+        for i in range(0, n_samples, block):
+            x = np.asarray(data[i:i + block])
+            out[:, i:i + len(x)] = x.reshape(len(x), -1).T
+        out.flush()
+        del out
     params['sampling_rate'] = sampling_rate
-    return SampledData(mdata, datfile, params)
+    params['dtype'] = data.dtype.str
+    params['layout'] = layout
+    write_metadata(datfile, **params)
+    return read_sampled(datfile, mode='r+', attrs=params)
 
 
-def read_sampled(datfile, mode="r"):
+def _n_columns(data):
+    "Number of channels in sampled data of at most 2 dimensions."
+    return 1 if len(data.shape) == 1 else data.shape[1]
+
+
+def read_sampled(datfile, mode="r", attrs=None):
     """Loads raw binary file and associated metadata into a sampled dataset.
     
     Args:
         datfile (str): path to raw binary file to read from
         mode: may be "r" or "r+"; use "r+" for modifying the data
             (not recommended)
+        attrs (dict): metadata of `datfile`, if already loaded; otherwise
+            it is read from the meta file
     
     Returns:
-        SampledData: sampled dataset containing `datfile`'s data
+        SampledData: sampled dataset containing `datfile`'s data. The data is
+        a memmap, a read-only :class:`bark.compressed.CompressedArray` for
+        compressed datasets, or a :class:`bark.concat.ConcatArray` for
+        virtual datasets. If the metadata has a `data_file` attribute, the
+        samples are read from that file instead of `datfile`, and a
+        `byte_offset` attribute skips a header (see :mod:`bark.io.wav`).
+    
+    Raises:
+        ValueError: if `mode` is "r+" for a compressed dataset, or one whose
+            samples are in a foreign file, which is never modified
     """
+    import numpy as np
     path = os.path.abspath(datfile)
-    params = read_metadata(datfile)
-    try:
-        data = np.memmap(datfile, dtype=params["dtype"], mode=mode)
-    except ValueError:
+    params = read_metadata(datfile) if attrs is None else attrs
+    if mode != 'r' and any(name in params for name in _FOREIGN_ATTRS):
+        raise ValueError('{} refers to samples in a foreign file, which are '
+                         'read only'.format(datfile))
+    if 'compression' in params:
+        from bark.compressed import CompressedArray
+        if mode != 'r':
+            raise ValueError('compressed datasets are read only')
+        return SampledData(CompressedArray(path, params), path, params)
+    if 'members' in params:
+        from bark.concat import ConcatArray
+        return SampledData(ConcatArray(path, params, mode), path, params)
+    dtype = np.dtype(params['dtype'])
+    datapath = _data_path(path, params)
+    offset = params.get('byte_offset', 0)
+    if 'byte_count' in params:
+        count = params['byte_count'] // dtype.itemsize
+    else:
+        count = (os.path.getsize(datapath) - offset) // dtype.itemsize
+    if count % len(params['columns']):
+        if not any(name in params for name in _FOREIGN_ATTRS):
+            raise ValueError('{} does not hold a whole number of samples of '
+                             '{} channels'.format(datfile,
+                                                  len(params['columns'])))
+        # a foreign file's data may end with a partial frame
+        count -= count % len(params['columns'])
+    if count > 0:
+        data = np.memmap(datapath, dtype=dtype, mode=mode, offset=offset,
+                         shape=(count, ))
+    else:
         data = np.array([])
-    data = data.reshape(-1, len(params['columns']))
+    if params.get('layout') == CHANNEL_MAJOR:
+        data = data.reshape(len(params['columns']), -1).T
+    else:
+        data = data.reshape(-1, len(params['columns']))
     return SampledData(data, path, params)
 
 
-def write_events(eventsfile, data, **params):
+def write_events(eventsfile, data, format='csv', **params):
     """Writes an event dataset and its metadata to disk.
     
     Args:
         eventsfile (str): path to file to write to. If the file exists, it is
             overwritten.
         data (Pandas DataFrame): event data; one column must be named 'start'
+        format (str): 'csv', or 'npy' for a binary structured array, which is
+            much faster to read for large datasets. In the 'npy' format,
+            string columns are stored as integer codes into a list of
+            `categories`, a column attribute.
         **params: all other keyword arguments are treated as dataset attributes,
             and added to the meta file
     
     Returns:
-        EventData: event dataset containing `data`
+        EventData: event dataset containing `data`. For CSV, this is a copy
+        of `data` rather than the file read back, which would be slow for
+        large datasets. For many small writes, see :class:`EventWriter`.
+
+    Raises:
+        ValueError: if `format` is not 'csv' or 'npy'
     """
     import pandas as pd
     if 'columns' not in params:
         params['columns'] = event_columns(data)
     if data.empty and not list(data.columns):
         data = pd.DataFrame({c: [] for c in params['columns']})
-    data.to_csv(eventsfile, index=False)
+    params.pop('format', None)
+    params['columns'] = _strip_categories(params['columns'])
+    if format == 'npy':
+        import numpy as np
+        params['columns'] = {k: dict(v) for k, v in params['columns'].items()}
+        with open(eventsfile, 'wb') as fp:
+            np.save(fp, _event_array(data, params['columns']))
+        params['format'] = format
+        write_metadata(eventsfile, **params)
+        # memory mapped, so nearly free to read back
+        return read_events(eventsfile, attrs=params)
+    elif format == 'csv':
+        data.to_csv(eventsfile, index=False)
+    else:
+        raise ValueError('unknown event format: {}'.format(format))
     write_metadata(eventsfile, **params)
-    return read_events(eventsfile)
+    return EventData(_fill_strings(data.reset_index(drop=True)), eventsfile,
+                     params)
+
+
+def _strip_categories(columns):
+    "Removes the `categories` of a previous npy file from event columns."
+    if not any(isinstance(v, Mapping) and 'categories' in v
+               for v in columns.values()):
+        return columns
+    return {k: {a: x for a, x in v.items() if a != 'categories'}
+            if isinstance(v, Mapping) else v for k, v in columns.items()}
 
 
-def read_events(eventsfile):
+def _event_array(data, columns):
+    """Converts event data to a structured array, for the npy format.
+    
+    String columns are replaced by integer codes; their categories are added
+    to the column attributes in `columns`.
+    """
+    import numpy as np
+    import pandas as pd
+    fields = []
+    for name in data.columns:
+        values = data[name]
+        if not (pd.api.types.is_numeric_dtype(values) or
+                pd.api.types.is_bool_dtype(values)):
+            codes, categories = pd.factorize(values.astype(object)
+                                             .fillna('').astype(str))
+            columns.setdefault(name, {'units': None})
+            columns[name]['categories'] = categories.tolist()
+            values = codes.astype(np.min_scalar_type(-len(categories)))
+        fields.append((str(name), np.asarray(values)))
+    array = np.empty(len(data), dtype=[(n, x.dtype) for n, x in fields])
+    for name, values in fields:
+        array[name] = values
+    return array
+
+
+def read_events(eventsfile, attrs=None):
     """Loads event data file and associated metadata into an event dataset.
     
     Args:
         eventsfile (str): path to file to read from
+        attrs (dict): metadata of `eventsfile`, if already loaded; otherwise
+            it is read from the meta file
+    
+    Columns of CSV files are parsed with the type given by their `dtype`
+    attribute, if any; columns in seconds are float64. Missing values in
+    string columns are replaced by empty strings.
     
     Returns:
        EventData: event dataset containing `eventsfile`'s data
     """
     import pandas as pd
-    data = pd.read_csv(eventsfile).fillna('')
-    params = read_metadata(eventsfile)
+    params = read_metadata(eventsfile) if attrs is None else attrs
+    if params.get('format') == 'npy':
+        data = _read_event_array(eventsfile, params['columns'])
+    else:
+        data = _fill_strings(pd.read_csv(
+            eventsfile, dtype=_event_dtypes(params.get('columns', {}))))
     return EventData(data, eventsfile, params)
 
 
-def read_dataset(fname):
+def _fill_strings(data):
+    "Replaces missing values in the string columns of `data` with ''."
+    import pandas as pd
+    for name in data.columns:
+        dtype = data[name].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            column = data[name]
+            if column.hasnans and pd.api.types.is_string_dtype(
+                    dtype.categories.dtype):
+                if '' not in dtype.categories:
+                    column = column.cat.add_categories([''])
+                data[name] = column.fillna('')
+        elif dtype == object or pd.api.types.is_string_dtype(dtype):
+            data[name] = data[name].fillna('')
+    return data
+
+
+def _event_dtypes(columns):
+    """Column types of CSV event data, from the columns' `dtype` attributes.
+    
+    Times in seconds default to float64, so that an integer valued first
+    block does not make the parser guess the wrong type.
+    """
+    dtypes = {}
+    for name, attrs in columns.items():
+        if not isinstance(attrs, Mapping):
+            continue
+        if 'dtype' in attrs:
+            dtypes[name] = attrs['dtype']
+        elif attrs.get('units') == 's':
+            dtypes[name] = 'float64'
+    return dtypes
+
+
+def _read_event_array(eventsfile, columns):
+    "Loads event data in the npy format into a DataFrame."
+    import numpy as np
+    import pandas as pd
+    try:
+        array = np.load(eventsfile, mmap_mode='r')
+    except ValueError:  # an empty file cannot be memory mapped
+        array = np.load(eventsfile)
+    data = {}
+    for name in array.dtype.names:
+        categories = columns.get(name, {}).get('categories')
+        if categories is None:
+            data[name] = array[name]
+        else:
+            data[name] = pd.Categorical.from_codes(array[name], categories)
+    return pd.DataFrame(data, columns=list(array.dtype.names))
+
+
+def read_dataset(fname, index=None, attrs=None):
     """Loads a file as a sampled or event dataset, as appropriate.
     
     Args:
         fname (str): path to file to load
+        index (MetaIndex): optional metadata cache, see :mod:`bark.index`
+        attrs (dict): metadata of `fname`, if already loaded
     
     Returns:
         Data: dataset containing `fname`'s data
     """
-    params = read_metadata(fname)
+    if attrs is None:
+        params = read_metadata(fname, index=index)
+    else:
+        params = attrs
     if 'dtype' in params:
-        dset = read_sampled(fname)
+        dset = read_sampled(fname, attrs=params)
     else:
-        dset = read_events(fname)
+        dset = read_events(fname, attrs=params)
     return dset
 
 
-def read_metadata(path, meta='.meta.yaml'):
+def read_metadata(path, meta='.meta.yaml', index=None):
     """Loads metadata for a dataset.
     
     Args:
         path (str): path to **dataset** (not meta file) whose metadata
             is to be loaded
         meta (str): suffix identifying the dataset's meta file
+        index (MetaIndex): optional metadata cache; if given, the meta file
+            is only parsed when it has changed since it was last cached
     
     Returns:
         dict: the loaded metadata
@@ -342,7 +1440,9 @@ def read_metadata(path, meta='.meta.yaml'):
     else:
         raise FileNotFoundError("No such file or directory:  '{}'".format(path))
     if os.path.exists(metafile):
-        return yaml.safe_load(open(metafile, 'r'))
+        if index is not None:
+            return index.get(metafile, ft.partial(_load_metafile, metafile))
+        return _load_metafile(metafile)
     else:
         m = "'{}' is missing an associated metafile, which should be named '{}'"
         raise FileNotFoundError(m.format(path, metafile))
@@ -367,23 +1467,54 @@ def write_metadata(path, meta='.meta.yaml', **params):
         metafile = os.path.join(path, meta[1:])
     else:
         metafile = path + meta
+    import yaml
+    np = sys.modules.get('numpy')  # if not imported, there are no arrays
     for k, v in params.items():
-        if isinstance(v, (np.ndarray, np.generic)):
+        if np is not None and isinstance(v, (np.ndarray, np.generic)):
             params[k] = v.tolist()
+    if isinstance(params.get('columns'), Columns):
+        params['columns'] = params['columns'].encode()
+    elif isinstance(params.get('columns'), Mapping):
+        # column views, e.g. from splitting a Columns table
+        params['columns'] = {k: dict(v) if isinstance(v, Mapping) else v
+                             for k, v in params['columns'].items()}
     with codecs.open(metafile, 'w', encoding='utf-8') as yaml_file:
-        yaml_file.write(yaml.safe_dump(params, default_flow_style=False))
+        yaml_file.write(yaml.dump(params, Dumper=_yaml_dumper(),
+                                  default_flow_style=False))
 
 
-def read_root(name):
+def _load_metafile(metafile):
+    import yaml
+    with open(metafile, 'r') as fp:
+        attrs = yaml.load(fp, Loader=_yaml_loader())
+    if isinstance(attrs, dict) and Columns.is_encoded(attrs.get('columns')):
+        columns = attrs['columns']
+        attrs['columns'] = Columns(columns['index'], columns['fields'])
+    return attrs
+
+
+def read_root(name, index=False, workers=None, cache=None):
     """Constructs a `Root` object from a directory.
     
     Args:
         name (str): path to a directory containig zero or more entries.
+        index (bool or MetaIndex): if `True`, entry and dataset metadata is
+            cached in an index file at the top of the Root, so that reopening
+            it only re-parses meta files that have changed. See
+            :mod:`bark.index`.
+        workers (int): if given, all entries and the metadata of their
+            datasets are loaded immediately, using a pool of this many
+            threads. Useful on network filesystems, when every entry will be
+            used anyway.
+        cache (bool or DatasetCache): if given, opened datasets are kept in
+            this least recently used cache, shared by all entries, instead of
+            for the lifetime of each entry. `True` uses the default limits.
+            See :mod:`bark.cache`.
     
     Returns:
         Root: a Root object containing all entries below `name`
     """
-    return Root(name)
+    return Root(name, index, workers, cache)
 
 
 def create_entry(name, timestamp, parents=False, **attributes):
@@ -416,36 +1547,133 @@ def create_entry(name, timestamp, parents=False, **attributes):
         os.makedirs(path)
 
     if "uuid" not in attributes:
+        from uuid import uuid4
         attributes["uuid"] = str(uuid4())
     attributes["timestamp"] = convert_timestamp(timestamp)
     write_metadata(os.path.join(name), **attributes)
     return read_entry(name)
 
 
-def read_entry(name, meta=".meta.yaml"):
+def read_entry(name, meta=".meta.yaml", index=None, preload=False,
+               cache=None):
     """Reads a Bark Entry from a directory.
     
     Args:
         name (str): path to Entry
         meta (str): suffix identifying the entry's meta file
+        index (MetaIndex): optional metadata cache, see :mod:`bark.index`
+        preload (bool): if `True`, the metadata of every dataset is read
+            immediately; the data itself is still loaded lazily
+        cache (DatasetCache): optional cache holding the opened datasets,
+            see :mod:`bark.cache`
     
     Returns:
         Entry: Entry containing all datasets in `name`
     """
     path = os.path.abspath(name)
-    attrs = read_metadata(path, meta)
+    attrs = read_metadata(path, meta, index)
     # load only files with associated metadata files
-    dset_metas = glob(os.path.join(path, "*" + meta))
-    dset_full_names = [x[:-len(meta)] for x in dset_metas]
-    dset_names = [os.path.split(x)[-1] for x in dset_full_names]
+    if index is None:
+        dset_names = _list_datasets(path, meta)
+    else:
+        dset_names = index.get(path, ft.partial(_list_datasets, path, meta))
+    dset_full_names = [os.path.join(path, x) for x in dset_names]
+    if preload:
+        dset_attrs = [read_metadata(x, index=index) for x in dset_full_names]
+    else:
+        dset_attrs = [None] * len(dset_names)
     # datasets are lazily loaded by creating a dictionary
     # with the dataset name and a function, that when called
-    # loads the data. See the custom LazyDict data structure
-    datasets = LazyDict({name: ft.partial(read_dataset, fname=full_name)
-                for name, full_name in zip(dset_names, dset_full_names)})
+    # loads the data. See the custom LazyDict and CachedDict data structures
+    loaders = {name: ft.partial(read_dataset, fname=full_name, index=index,
+                                attrs=dset_attr)
+               for name, full_name, dset_attr in zip(dset_names,
+                                                     dset_full_names,
+                                                     dset_attrs)}
+    if cache is None:
+        datasets = LazyDict(loaders)
+    else:
+        datasets = CachedDict(cache, path, loaders)
     return Entry(datasets, path, attrs)
 
 
+def _list_subdirs(path):
+    "Names of the subdirectories (potential entries) of `path`."
+    # scandir caches the file type, so no extra stat call is needed
+    return [x.name for x in os.scandir(path)
+            if x.is_dir() and x.name[-1] != '.']
+
+
+def _list_datasets(path, meta=".meta.yaml"):
+    "Names of the files in `path` that have an associated meta file."
+    return [x.name[:-len(meta)] for x in os.scandir(path)
+            if x.name.endswith(meta) and not x.name.startswith('.')]
+
+
+def _sampled_length(path, attrs):
+    "Number of samples in a sampled dataset, from its size on disk."
+    import numpy as np
+    if 'compression' in attrs:
+        from bark.compressed import read_trailer
+        return read_trailer(path)[0]
+    if attrs.get('members'):
+        from bark.concat import _member_path
+        last = attrs['members'][-1]
+        last_path = _member_path(path, last)
+        return last['start'] + _sampled_length(last_path,
+                                               read_metadata(last_path))
+    frame = np.dtype(attrs['dtype']).itemsize * len(attrs['columns'])
+    if 'byte_count' in attrs:
+        return attrs['byte_count'] // frame
+    size = os.path.getsize(_data_path(path, attrs))
+    return (size - attrs.get('byte_offset', 0)) // frame
+
+
+def _data_path(path, attrs):
+    """The file holding a sampled dataset's samples: its `data_file`
+    attribute, relative to the dataset's directory, or the dataset itself."""
+    if 'data_file' not in attrs:
+        return path
+    directory = os.path.dirname(os.path.abspath(path))
+    return os.path.normpath(os.path.join(directory, attrs['data_file']))
+
+
+def _entry_span(path, meta=".meta.yaml", index=None):
+    """Start (POSIX seconds) and duration (seconds) of an entry.
+
+    The duration is the end of the entry's last sampled dataset, found from
+    file sizes without opening the data. Event datasets are not counted.
+    """
+    attrs = read_metadata(path, meta, index)
+    start = timestamp_to_datetime(attrs['timestamp']).timestamp()
+    if index is None:
+        dset_names = _list_datasets(path, meta)
+    else:
+        dset_names = index.get(path, ft.partial(_list_datasets, path, meta))
+    duration = 0
+    for name in dset_names:
+        dset_path = os.path.join(path, name)
+        dset_attrs = read_metadata(dset_path, index=index)
+        if 'dtype' not in dset_attrs:
+            continue
+        n_samples = (dset_attrs.get('offset', 0) +
+                     _sampled_length(dset_path, dset_attrs))
+        duration = max(duration, n_samples / dset_attrs['sampling_rate'])
+    return start, duration
+
+
+def _posix_time(obj):
+    "POSIX time of a timestamp, using `convert_timestamp` for naive times."
+    return timestamp_to_datetime(convert_timestamp(obj)).timestamp()
+
+
+def _thread_map(func, items, workers):
+    "Like `map`, but evaluated on a pool of `workers` threads."
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items))
+
+
 def convert_timestamp(obj, default_tz='America/Chicago'):
     """Makes a Bark timestamp from an object.
     
@@ -460,11 +1688,14 @@ def convert_timestamp(obj, default_tz='America/Chicago'):
     Returns:
         Arrow: Bark timestamp
     """
+    from dateutil import tz
     dt = timestamp_to_datetime(obj)
-    if dt.tzinfo:
-        return arrow.get(dt).isoformat()
-    else:
-        return arrow.get(dt, default_tz).isoformat()
+    if not dt.tzinfo:
+        tzinfo = tz.gettz(default_tz)
+        if tzinfo is None:
+            raise ValueError('unknown timezone: {}'.format(default_tz))
+        dt = dt.replace(tzinfo=tzinfo)
+    return dt.isoformat()
 
 
 def timestamp_to_datetime(obj):
@@ -494,10 +1725,10 @@ def timestamp_to_datetime(obj):
     from time import mktime, struct_time
     if isinstance(obj, datetime):
         dt = obj
-    elif isinstance(obj, arrow.Arrow):
+    elif _is_arrow(obj):
         dt = obj.datetime
     elif isinstance(obj, str):
-        dt = arrow.get(obj).datetime
+        dt = _parse_timestamp(obj)
     elif isinstance(obj, struct_time):
         dt = mktime(obj)
     elif isinstance(obj, numbers.Number):
@@ -510,6 +1741,29 @@ def timestamp_to_datetime(obj):
     return dt
 
 
+def _is_arrow(obj):
+    arrow = sys.modules.get('arrow')  # if not imported, obj isn't an Arrow
+    return arrow is not None and isinstance(obj, arrow.Arrow)
+
+
+@ft.lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _parse_timestamp(string):
+    """Parses a timestamp string, memoizing the result.
+    
+    Standard library ISO 8601 parsing is tried first; Arrow handles anything
+    else. As with Arrow, timezone-naive strings are taken to be UTC.
+    """
+    from dateutil import tz
+    try:
+        dt = datetime.fromisoformat(string)
+    except (AttributeError, ValueError):  # before Python 3.7, or not ISO
+        import arrow
+        return arrow.get(string).datetime
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz.tzutc())
+    return dt
+
+
 def timestamp_to_float(timestamp):
     """Converts a time object to a floating point value (epoch time).
     
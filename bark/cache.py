@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# -*- mode: python -*-
+"""
+Bounded in-memory cache of opened datasets.
+
+By default an Entry keeps every dataset it has loaded for as long as the Entry
+exists, so walking a large Root holds open a memmap (and a file descriptor)
+for every sampled dataset and a DataFrame for every event dataset. A
+`DatasetCache` shared by the entries of a Root instead keeps only the most
+recently used datasets, within limits on the number of open memmaps, the
+memory used by event data and the number of datasets. Evicted datasets are
+read again the next time they are accessed.
+"""
+from __future__ import division, print_function, absolute_import, \
+        unicode_literals
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'items',
+                                     'memmaps', 'event_bytes'])
+
+
+def _footprint(dataset):
+    """Returns the (open memmaps or files, event bytes) held by
+    `dataset`."""
+    data = getattr(dataset, 'data', None)
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(data, np.memmap):
+        return 1, 0
+    compressed = sys.modules.get('bark.compressed')
+    if compressed is not None and isinstance(data,
+                                             compressed.CompressedArray):
+        return 1, 0  # holds its file open, as a memmap does
+    if hasattr(data, 'members'):  # a virtual dataset
+        return sum(_footprint(x)[0] for x in data.members), 0
+    if hasattr(data, 'memory_usage'):  # a DataFrame
+        return 0, int(data.memory_usage(deep=True).sum())
+    return 0, 0
+
+
+class DatasetCache():
+    """A least recently used cache of datasets.
+
+    Args:
+        max_memmaps (int): most sampled datasets to keep open
+        max_event_bytes (int): most memory, in bytes, to spend on event data
+        max_items (int): most datasets of any kind to keep
+
+    Any limit may be `None` for no limit. The most recently loaded dataset is
+    always kept, even if it alone exceeds a limit. The `hits`, `misses` and
+    `evictions` counters, also available from :meth:`info`, help with
+    choosing the limits.
+    """
+    def __init__(self, max_memmaps=64, max_event_bytes=256 * 2**20,
+                 max_items=1024):
+        self.max_memmaps = max_memmaps
+        self.max_event_bytes = max_event_bytes
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.memmaps = 0
+        self.event_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, loader):
+        """Returns the dataset stored under `key`, calling `loader` if absent.
+
+        Args:
+            key: a hashable identifying the dataset, usually its path
+            loader (callable): function of no arguments that reads the dataset
+
+        Returns:
+            the cached or newly loaded dataset
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key][0]
+            self.misses += 1
+        dataset = loader()
+        memmaps, nbytes = _footprint(dataset)
+        with self._lock:
+            if key in self._items:  # loaded concurrently by another thread
+                self._discard(key)
+            self._items[key] = (dataset, memmaps, nbytes)
+            self.memmaps += memmaps
+            self.event_bytes += nbytes
+            self._evict()
+        return dataset
+
+    def _over(self):
+        return ((self.max_items is not None and
+                 len(self._items) > self.max_items) or
+                (self.max_memmaps is not None and
+                 self.memmaps > self.max_memmaps) or
+                (self.max_event_bytes is not None and
+                 self.event_bytes > self.max_event_bytes))
+
+    def _evict(self):
+        while len(self._items) > 1 and self._over():
+            self._discard(next(iter(self._items)))
+            self.evictions += 1
+
+    def _discard(self, key):
+        _, memmaps, nbytes = self._items.pop(key)
+        self.memmaps -= memmaps
+        self.event_bytes -= nbytes
+
+    def clear(self):
+        "Drops every cached dataset. The counters are not reset."
+        with self._lock:
+            self._items.clear()
+            self.memmaps = 0
+            self.event_bytes = 0
+
+    def info(self):
+        "Returns the counters and current usage as a `CacheInfo` tuple."
+        return CacheInfo(self.hits, self.misses, self.evictions,
+                         len(self._items), self.memmaps, self.event_bytes)
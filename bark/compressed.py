@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+# -*- mode: python -*-
+"""
+Lossless compressed storage for sampled datasets.
+
+The samples are cut into blocks of a fixed number of samples, and each block
+is compressed on its own, so any range of samples can be read by
+decompressing only the blocks it covers. For integer data, each block is
+first delta coded along time, which makes slowly varying signals much more
+compressible. Within a block, samples are stored channel by channel.
+
+The data file holds the compressed blocks one after the other, followed by
+the byte offset of each block and of the end of the last block (unsigned
+64-bit little endian integers), and a 24 byte trailer: the number of blocks,
+the number of samples, and the magic string `BARKCMP1`. The codec, the block
+size and whether delta coding was used are stored in the `compression`
+attribute of the meta file, for example::
+
+    compression: {codec: zlib, delta: true, block_size: 4096}
+
+A dataset with this attribute is read by :func:`bark.read_sampled` as a
+:class:`CompressedArray`, and written by :func:`bark.write_sampled` when it is
+given a `compression` codec.
+"""
+from __future__ import division, print_function, absolute_import, \
+        unicode_literals
+import os
+import struct
+import threading
+from bark.bark import SampledWriter
+
+BLOCK_BYTES = 2**18  # default uncompressed size of a block
+MAGIC = b'BARKCMP1'
+_TRAILER = struct.Struct('<QQ8s')
+
+
+def _codec(name):
+    "The module (zlib, lzma or bz2) implementing a codec."
+    import bz2
+    import lzma
+    import zlib
+    codecs = {'zlib': zlib, 'lzma': lzma, 'bz2': bz2}
+    if name not in codecs:
+        raise ValueError('unknown codec: {}'.format(name))
+    return codecs[name]
+
+
+def encode_block(block, codec='zlib', delta=True, level=None):
+    """Compresses a block of samples.
+
+    Args:
+        block (numpy.ndarray): samples, of shape (samples, channels)
+        codec (str): 'zlib', 'lzma' or 'bz2'
+        delta (bool): if `True`, delta code the samples first; integer
+            blocks only
+        level (int): compression level, or `None` for the codec's default
+
+    Returns:
+        bytes: the compressed block
+    """
+    import numpy as np
+    if delta:
+        diff = block.copy()
+        diff[1:] -= block[:-1]  # wraps around, so the coding is lossless
+        block = diff
+    raw = np.ascontiguousarray(block.T).tobytes()
+    module = _codec(codec)
+    if level is None:
+        return module.compress(raw)
+    if module.__name__ == 'lzma':
+        return module.compress(raw, preset=level)
+    return module.compress(raw, level)
+
+
+def decode_block(buf, dtype, n_columns, codec='zlib', delta=True):
+    "Inverse of :func:`encode_block`, returns an array (samples, channels)."
+    import numpy as np
+    block = np.frombuffer(_codec(codec).decompress(buf), dtype=dtype)
+    block = block.reshape(n_columns, -1).T
+    if delta:
+        block = np.cumsum(block, axis=0, dtype=block.dtype)
+    return block
+
+
+def read_trailer(path):
+    """Reads the block offsets of a compressed data file.
+
+    Returns:
+        tuple: (number of samples, list of block offsets)
+
+    Raises:
+        ValueError: if `path` is not a compressed data file
+    """
+    with open(path, 'rb') as fp:
+        fp.seek(0, os.SEEK_END)
+        size = fp.tell()
+        if size < _TRAILER.size:
+            raise ValueError('{} is not a compressed data file'.format(path))
+        fp.seek(size - _TRAILER.size)
+        n_blocks, n_samples, magic = _TRAILER.unpack(fp.read(_TRAILER.size))
+        if magic != MAGIC:
+            raise ValueError('{} is not a compressed data file'.format(path))
+        index_size = 8 * (n_blocks + 1)
+        fp.seek(size - _TRAILER.size - index_size)
+        offsets = struct.unpack('<{}Q'.format(n_blocks + 1),
+                                fp.read(index_size))
+    return n_samples, list(offsets)
+
+
+class CompressedArray():
+    """A read-only, array-like view of a compressed sampled dataset.
+
+    Args:
+        path (str): path to the compressed data file
+        attrs (dict): metadata of the dataset
+        workers (int): threads used to decompress many blocks at once;
+            defaults to the number of CPUs, up to 8
+
+    Slicing returns numpy arrays, decompressing only the blocks needed. The
+    most recently decompressed block is kept, so reading consecutive short
+    slices is fast.
+    """
+    ndim = 2
+
+    def __init__(self, path, attrs, workers=None):
+        import numpy as np
+        self.path = path
+        self.dtype = np.dtype(attrs['dtype'])
+        compression = attrs['compression']
+        self.codec = compression['codec']
+        self.delta = compression.get('delta', False)
+        self.block_size = compression['block_size']
+        n_samples, self.offsets = read_trailer(path)
+        self.shape = (n_samples, len(attrs['columns']))
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self._fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        self._lock = threading.Lock()
+        self._last = (None, None)
+
+    def __del__(self):
+        fd = getattr(self, '_fd', None)
+        if fd is not None:
+            os.close(fd)
+
+    @property
+    def n_blocks(self):
+        return len(self.offsets) - 1
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return 'CompressedArray({!r}, shape={}, dtype={})'.format(
+            self.path, self.shape, self.dtype)
+
+    def _read(self, offset, size):
+        if hasattr(os, 'pread'):
+            return os.pread(self._fd, size, offset)
+        with self._lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            return os.read(self._fd, size)
+
+    def block(self, i):
+        "Returns block `i`, decompressed."
+        last_i, last = self._last
+        if last_i == i:
+            return last
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        block = decode_block(self._read(start, stop - start), self.dtype,
+                             self.shape[1], self.codec, self.delta)
+        self._last = (i, block)
+        return block
+
+    def _blocks(self, indices):
+        "Decompresses several blocks, in parallel if there are many."
+        if len(indices) < 2 or self.workers < 2:
+            return [self.block(i) for i in indices]
+        from concurrent.futures import ThreadPoolExecutor
+        # the codecs release the GIL while decompressing
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(self.block, indices))
+
+    def read(self, start, stop):
+        "Returns samples `start` to `stop` as an array."
+        import numpy as np
+        start = min(max(start, 0), self.shape[0])
+        stop = min(max(stop, start), self.shape[0])
+        if start == stop:
+            return np.empty((0, self.shape[1]), dtype=self.dtype)
+        first = start // self.block_size
+        last = (stop - 1) // self.block_size
+        blocks = self._blocks(range(first, last + 1))
+        offset = first * self.block_size
+        if len(blocks) == 1:
+            return blocks[0][start - offset:stop - offset]
+        return np.concatenate(blocks)[start - offset:stop - offset]
+
+    def chunks(self, chunksize):
+        "Iterates over the data in arrays of `chunksize` samples."
+        for start in range(0, self.shape[0], chunksize):
+            yield self.read(start, start + chunksize)
+
+    def __getitem__(self, key):
+        import numpy as np
+        if isinstance(key, tuple):
+            rows, cols = key[0], key[1:]
+        else:
+            rows, cols = key, ()
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(self.shape[0])
+            if step > 0:
+                result = self.read(start, stop)[::step]
+            else:
+                result = self.read(stop + 1, start + 1)[::-1][::-step]
+        elif np.ndim(rows) == 0:
+            i = int(rows)
+            if i < 0:
+                i += self.shape[0]
+            if not 0 <= i < self.shape[0]:
+                raise IndexError('index {} is out of bounds'.format(rows))
+            result = self.read(i, i + 1)[0]
+            return result[cols] if cols else result
+        else:
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                rows = np.flatnonzero(rows)
+            rows = np.where(rows < 0, rows + self.shape[0], rows)
+            if len(rows) and (rows.min() < 0 or rows.max() >= self.shape[0]):
+                raise IndexError('index out of bounds')
+            result = np.empty(rows.shape + (self.shape[1], ), self.dtype)
+            blocks = rows // self.block_size
+            for b in np.unique(blocks):
+                mask = blocks == b
+                result[mask] = self.block(b)[rows[mask] - b * self.block_size]
+        return result[(slice(None), ) + cols] if cols else result
+
+    def __array__(self, dtype=None, copy=None):
+        data = self.read(0, self.shape[0])
+        return data if dtype is None else data.astype(dtype)
+
+
+class CompressedWriter(SampledWriter):
+    """Writes a compressed sampled dataset incrementally.
+
+    Args:
+        datfile (str): path to file to write to
+        sampling_rate (int or float): sampling rate of the data
+        dtype: data type of the samples; if `None`, that of the first block
+        codec (str): 'zlib', 'lzma' or 'bz2'
+        delta (bool): delta code integer data before compressing it
+        block_size (int): samples per compressed block; by default, enough
+            for about `BLOCK_BYTES` of uncompressed data
+        level (int): compression level, or `None` for the codec's default
+        **params: all other keyword arguments are treated as dataset
+            attributes, and added to the meta file
+
+    Used like :class:`bark.SampledWriter`. Appending is not supported.
+    """
+    def __init__(self, datfile, sampling_rate, dtype=None, codec='zlib',
+                 delta=True, block_size=None, level=None, **params):
+        _codec(codec)  # fail early on unknown codecs
+        params.pop('compression', None)
+        super().__init__(datfile, sampling_rate, dtype, append=False,
+                         **params)
+        self.codec = codec
+        self.delta = delta
+        self.block_size = None if block_size is None else int(block_size)
+        self.level = level
+        self._pending = []
+        self._n_pending = 0
+        self._offsets = [0]
+
+    def write(self, data):
+        """Appends samples to the file.
+
+        Args:
+            data (array): block of samples, of at most 2 dimensions
+        """
+        import numpy as np
+        data = np.asarray(data)
+        self.dtype = np.dtype(data.dtype if self.dtype is None else self.dtype)
+        from bark.bark import sampled_columns
+        if 'columns' not in self.attrs:
+            self.attrs['columns'] = sampled_columns(data)
+        else:  # a block of other channels would corrupt the file
+            sampled_columns(data, self.attrs['columns'])
+        data = data.astype(self.dtype, copy=False).reshape(data.shape[0], -1)
+        if self.block_size is None:
+            self._default_block_size(data.shape[1])
+        self._pending.append(data)
+        self._n_pending += data.shape[0]
+        self.n_samples += data.shape[0]
+        if self._n_pending >= self.block_size:
+            self._flush(final=False)
+
+    def _default_block_size(self, n_columns):
+        row_bytes = self.dtype.itemsize * max(n_columns, 1)
+        self.block_size = max(BLOCK_BYTES // row_bytes, 256)
+
+    def _flush(self, final):
+        import numpy as np
+        if not self._pending:
+            return
+        data = np.concatenate(self._pending)
+        delta = self.delta and self.dtype.kind in 'iu'
+        n_full = len(data) // self.block_size * self.block_size
+        stop = len(data) if final else n_full
+        for start in range(0, stop, self.block_size):
+            block = data[start:start + self.block_size]
+            buf = encode_block(block, self.codec, delta, self.level)
+            self._fp.write(buf)
+            self._offsets.append(self._offsets[-1] + len(buf))
+        rest = data[stop:]
+        self._pending = [rest] if len(rest) else []
+        self._n_pending = len(rest)
+
+    def close(self):
+        """Writes the remaining samples, the block index and the meta file.
+
+        Returns:
+            SampledData: the written dataset
+        """
+        import numpy as np
+        if not self._fp.closed:
+            if self.dtype is None:
+                self._fp.close()
+                raise ValueError('no data was written to {}, and no dtype '
+                                 'was given'.format(self.path))
+            self.dtype = np.dtype(self.dtype)
+            if self.block_size is None:
+                self._default_block_size(len(self.attrs.get('columns', ())))
+            self._flush(final=True)
+            n_blocks = len(self._offsets) - 1
+            self._fp.write(struct.pack('<{}Q'.format(n_blocks + 1),
+                                       *self._offsets))
+            self._fp.write(_TRAILER.pack(n_blocks, self.n_samples, MAGIC))
+            self.attrs['compression'] = {
+                'codec': self.codec,
+                'delta': bool(self.delta and self.dtype.kind in 'iu'),
+                'block_size': self.block_size}
+        return super().close()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# -*- mode: python -*-
+"""
+Virtual concatenation of sampled datasets.
+
+A virtual dataset stores no samples of its own. Its meta file lists the
+sampled datasets it is made of, its *members*, and the sample at which each
+one starts, for example::
+
+    members:
+    - {path: day1.dat, start: 0}
+    - {path: day2.dat, start: 86400000}
+
+Member paths are relative to the directory of the virtual dataset. Its data
+file is an empty placeholder. A dataset with this attribute is read by
+:func:`bark.read_sampled` as a :class:`ConcatArray`, which reads from the
+members as if they were one array, so concatenating recordings takes no disk
+space and no copying.
+"""
+from __future__ import division, print_function, absolute_import, \
+        unicode_literals
+import os
+from bisect import bisect_right
+
+
+def _member_path(path, member):
+    return os.path.join(os.path.dirname(os.path.abspath(path)),
+                        member['path'])
+
+
+class ConcatArray():
+    """An array-like view of the members of a virtual dataset, end to end.
+
+    Args:
+        path (str): path to the virtual dataset
+        attrs (dict): metadata of the dataset
+        mode (str): mode in which to open the members, "r" or "r+"
+
+    Slices that fall within one member are views of that member's data, and
+    are not copied. Slices across members are copied.
+
+    Raises:
+        ValueError: if a member does not match the dataset's dtype or
+            channels, or its length does not match the recorded starts
+    """
+    ndim = 2
+
+    def __init__(self, path, attrs, mode='r'):
+        import numpy as np
+        from bark.bark import read_sampled
+        self.path = path
+        self.dtype = np.dtype(attrs['dtype'])
+        n_columns = len(attrs['columns'])
+        self.members = []
+        self.starts = []
+        for member in attrs['members']:
+            dset = read_sampled(_member_path(path, member), mode)
+            if (dset.data.dtype != self.dtype or
+                    dset.data.shape[1] != n_columns):
+                raise ValueError('{} does not match the dtype and channels '
+                                 'of {}'.format(dset.path, path))
+            self.members.append(dset)
+            self.starts.append(member['start'])
+        stops = self.starts[1:]
+        for dset, start, stop in zip(self.members, self.starts, stops):
+            if start + dset.data.shape[0] != stop:
+                raise ValueError('{} has changed length since {} was '
+                                 'created'.format(dset.path, path))
+        # the last member may have grown since, for example if it is the
+        # recording in progress
+        n_samples = (self.starts[-1] + self.members[-1].data.shape[0]
+                     if self.members else 0)
+        self.shape = (n_samples, n_columns)
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return 'ConcatArray({!r}, shape={}, dtype={})'.format(
+            self.path, self.shape, self.dtype)
+
+    def _member(self, i):
+        "Index of the member holding sample `i`."
+        return bisect_right(self.starts, i) - 1
+
+    def read(self, start, stop):
+        """Returns samples `start` to `stop`, a view if they are all in one
+        member."""
+        import numpy as np
+        start = min(max(start, 0), self.shape[0])
+        stop = min(max(stop, start), self.shape[0])
+        if start == stop:
+            return np.empty((0, self.shape[1]), dtype=self.dtype)
+        first = self._member(start)
+        last = self._member(stop - 1)
+        parts = []
+        for i in range(first, last + 1):
+            offset = self.starts[i]
+            parts.append(self.members[i].data[max(start - offset, 0):
+                                              stop - offset])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def chunks(self, chunksize):
+        "Iterates over the data in arrays of `chunksize` samples."
+        for start in range(0, self.shape[0], chunksize):
+            yield self.read(start, start + chunksize)
+
+    def __getitem__(self, key):
+        import numpy as np
+        if isinstance(key, tuple):
+            rows, cols = key[0], key[1:]
+        else:
+            rows, cols = key, ()
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(self.shape[0])
+            if step > 0:
+                result = self.read(start, stop)[::step]
+            else:
+                result = self.read(stop + 1, start + 1)[::-1][::-step]
+        elif np.ndim(rows) == 0:
+            i = int(rows)
+            if i < 0:
+                i += self.shape[0]
+            if not 0 <= i < self.shape[0]:
+                raise IndexError('index {} is out of bounds'.format(rows))
+            m = self._member(i)
+            result = self.members[m].data[i - self.starts[m]]
+            return result[cols] if cols else result
+        else:
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                rows = np.flatnonzero(rows)
+            rows = np.where(rows < 0, rows + self.shape[0], rows)
+            if len(rows) and (rows.min() < 0 or rows.max() >= self.shape[0]):
+                raise IndexError('index out of bounds')
+            result = np.empty(rows.shape + (self.shape[1], ), self.dtype)
+            members = np.searchsorted(self.starts, rows, side='right') - 1
+            for m in np.unique(members):
+                mask = members == m
+                result[mask] = self.members[m].data[rows[mask] -
+                                                    self.starts[m]]
+        return result[(slice(None), ) + cols] if cols else result
+
+    def __array__(self, dtype=None, copy=None):
+        data = self.read(0, self.shape[0])
+        return data if dtype is None else data.astype(dtype)
+
+
+def concatenate(datfile, datfiles, **params):
+    """Creates a virtual dataset of several sampled datasets, end to end.
+
+    Args:
+        datfile (str): path of the virtual dataset. An empty placeholder data
+            file is written here, along with the meta file.
+        datfiles (list of str): paths of the datasets to concatenate, in
+            order. Virtual datasets are replaced by their members, so a
+            virtual dataset can be extended by concatenating it with new
+            recordings.
+        **params: all other keyword arguments are treated as dataset
+            attributes, and added to the meta file. By default, the
+            sampling rate, dtype and columns are those of the first dataset.
+
+    Returns:
+        SampledData: the virtual dataset
+
+    Raises:
+        ValueError: if the datasets differ in sampling rate, dtype or number
+            of channels
+    """
+    import numpy as np
+    from bark.bark import read_metadata, read_sampled, write_metadata, \
+        _sampled_length
+    paths = []
+    for name in datfiles:
+        attrs = read_metadata(name)
+        if 'members' in attrs:
+            paths.extend(_member_path(name, m) for m in attrs['members'])
+        else:
+            paths.append(os.path.abspath(name))
+    if not paths:
+        raise ValueError('no datasets to concatenate')
+    members = []
+    start = 0
+    first = None
+    directory = os.path.dirname(os.path.abspath(datfile))
+    for path in paths:
+        attrs = read_metadata(path)
+        key = (attrs['sampling_rate'], np.dtype(attrs['dtype']),
+               len(attrs['columns']))
+        if first is None:
+            first = attrs
+            first_key = key
+        elif key != first_key:
+            raise ValueError('{} differs from {} in sampling rate, dtype or '
+                             'channels'.format(path, paths[0]))
+        members.append({'path': os.path.relpath(path, directory),
+                        'start': start})
+        start += _sampled_length(path, attrs)
+    for name in ('sampling_rate', 'dtype', 'columns'):
+        params.setdefault(name, first[name])
+    params['members'] = members
+    open(datfile, 'wb').close()
+    write_metadata(datfile, **params)
+    return read_sampled(datfile)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# -*- mode: python -*-
+"""
+Persistent on-disk cache of Bark metadata.
+
+A `MetaIndex` lives in a single SQLite file at the top of a Root. It stores
+parsed meta files and directory listings, keyed by path relative to the Root
+and validated against the file's modification time and size. Anything that
+changed on disk since it was cached is re-read, so the index never needs to be
+rebuilt by hand; deleting the index file is always safe.
+"""
+from __future__ import division, print_function, absolute_import, \
+        unicode_literals
+import os
+import pickle
+import sqlite3
+import threading
+import weakref
+
+INDEX_NAME = '.bark-index.sqlite'
+COMMIT_EVERY = 256
+
+
+class _Store():
+    "Owns the database connection, so it can be flushed by a finalizer."
+    def __init__(self, path):
+        self.pending = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        try:
+            # the index is only a cache: trade durability for speed, and keep
+            # journal files from touching the Root's modification time
+            self.conn.execute('PRAGMA journal_mode=MEMORY')
+            self.conn.execute('PRAGMA synchronous=OFF')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS records '
+                              '(path TEXT PRIMARY KEY, mtime INTEGER, '
+                              'size INTEGER, value BLOB)')
+            self.conn.commit()
+        except sqlite3.DatabaseError:
+            self.conn.close()
+            raise
+
+    def load(self):
+        query = 'SELECT path, mtime, size, value FROM records'
+        return {path: (mtime, size, value)
+                for path, mtime, size, value in self.conn.execute(query)}
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows = [(key, ) + record for key, record in self.pending.items()]
+        try:
+            self.conn.executemany('INSERT OR REPLACE INTO records VALUES '
+                                  '(?, ?, ?, ?)', rows)
+            self.conn.commit()
+        except sqlite3.DatabaseError:
+            # locked by another process, read-only, or corrupt; the records
+            # are kept and retried on the next flush
+            self.conn.rollback()
+        else:
+            self.pending.clear()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+
+
+class MetaIndex():
+    """Caches the results of expensive filesystem reads below a Root.
+
+    Args:
+        root (str): path to the directory the index covers
+        filename (str): name of the index file, created inside `root`
+
+    Values are pickled, so each call to :meth:`get` returns a fresh copy that
+    callers may modify freely. New records are written in batches of
+    `COMMIT_EVERY`, on :meth:`flush`, and when the index is garbage collected
+    or the interpreter exits. If the index file cannot be read or written,
+    the index silently behaves as an in-memory cache.
+    """
+    def __init__(self, root, filename=INDEX_NAME):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, filename)
+        self._lock = threading.Lock()
+        self._store, self._records = self._open()
+        self._finalizer = weakref.finalize(self, self._store.close)
+
+    def _open(self):
+        "Returns the store and its records, falling back to memory."
+        try:
+            store = _Store(self.path)
+            return store, store.load()
+        except sqlite3.OperationalError:
+            pass  # cannot be created or written, as in a read-only Root
+        except sqlite3.DatabaseError:
+            # corrupt: start a new index in its place
+            try:
+                os.remove(self.path)
+                return _Store(self.path), {}
+            except (OSError, sqlite3.DatabaseError):
+                pass
+        return _Store(':memory:'), {}
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, path, loader):
+        """Returns the cached value for `path`, calling `loader` if stale.
+
+        Args:
+            path (str): file or directory the value was derived from
+            loader (callable): function of no arguments that produces the
+                value from the filesystem
+
+        Returns:
+            the (possibly cached) result of `loader()`
+
+        Raises:
+            FileNotFoundError: if `path` does not exist
+        """
+        stat = os.stat(path)
+        key = os.path.relpath(os.path.abspath(path), self.root)
+        record = self._records.get(key)
+        if (record is not None and record[0] == stat.st_mtime_ns and
+                record[1] == stat.st_size):
+            return pickle.loads(record[2])
+        value = loader()
+        record = (stat.st_mtime_ns, stat.st_size,
+                  pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._records[key] = record
+            self._store.pending[key] = record
+            if len(self._store.pending) >= COMMIT_EVERY:
+                self._store.flush()
+        return value
+
+    def flush(self):
+        "Writes any pending records to disk."
+        with self._lock:
+            self._store.flush()
+
+    def close(self):
+        "Flushes and closes the index file."
+        self._finalizer()
@@ -6,9 +6,7 @@
 import os.path
 from glob import glob
 import numpy as np
-from bark.io.openephys.kwik import load_all
-from bark import write_metadata, create_entry
-import arrow
+from bark import write_metadata, create_entry, Columns
 from dateutil import tz
 
 # number of data points to write at a time, prevents excess memory usage
@@ -16,11 +14,13 @@ BUFFERSIZE = 131072
 
 
 def filename_to_timestamp(fname, timezone):
+    import arrow
     return arrow.get(fname, 'YYYY-MM-DD_HH-mm-ss').replace(
         tzinfo=tz.gettz(timezone)).datetime
 
 
 def input_string_to_timestamp(string, timezone):
+    import arrow
     return arrow.get(string).replace(tzinfo=tz.gettz(timezone)).datetime
 
 
@@ -54,16 +54,17 @@ def eofolder2entry(oefolder,
 
 
 def write_from_kwd(kwd, dat):
+    from bark.io.openephys.kwik import load_all
     all_data = load_all(kwd)
     n_channels = all_data[0]['data'].shape[1]
     for group_i, data in enumerate(all_data):
         write_binary(dat, data["data"])
         assert data["data"].shape[1] == n_channels
     sampling_rate = data["info"]["sample_rate"]
-    columns = {i:
-               {'units': 'uV',
-                'unit_scale': float(data['app_attrs']['channel_bit_volts'][i])}
-               for i in range(n_channels)}
+    columns = Columns(range(n_channels),
+                      {'units': ['uV'] * n_channels,
+                       'unit_scale': [float(x) for x in
+                                      data['app_attrs']['channel_bit_volts']]})
     write_metadata(dat,
                    sampling_rate=sampling_rate,
                    dtype=data['data'].dtype.str,
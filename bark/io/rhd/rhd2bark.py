@@ -1,10 +1,9 @@
 import sys
 import os.path
-import arrow
 from dateutil import tz
 import numpy as np
 from bark.io.rhd.load_intan_rhd_format import read_data
-from bark import create_entry, write_metadata
+from bark import create_entry, write_metadata, Columns
 
 
 def bark_rhd_to_entry():
@@ -56,11 +55,13 @@ def bark_rhd_to_entry():
 
 
 def rhd_filename_to_timestamp(fname, timezone):
+    import arrow
     return arrow.get(fname, 'YYMMDD_HHmmss').replace(
         tzinfo=tz.gettz(timezone)).datetime
 
 
 def input_string_to_timestamp(string, timezone):
+    import arrow
     return arrow.get(string).replace(tzinfo=tz.gettz(timezone)).datetime
 
 
@@ -88,7 +89,7 @@ def board_adc_metadata(result, dsetname):
     for k in columns:
         columns[k]['units'] = 'V'
         columns[k]['unit_scale'] = result['ADC_input_bit_volts']
-    write_metadata(dsetname, columns=columns, **attrs)
+    write_metadata(dsetname, columns=Columns.from_dict(columns), **attrs)
 
 
 def amplifier_metadata(result, dsetname):
@@ -101,7 +102,7 @@ def amplifier_metadata(result, dsetname):
     for k in columns:
         columns[k]['units'] = 'uV'
         columns[k]['unit_scale'] = result['amplifier_bit_microvolts']
-    write_metadata(dsetname, columns=columns, **attrs)
+    write_metadata(dsetname, columns=Columns.from_dict(columns), **attrs)
 
 
 def not_implemented_warnings(result):
@@ -4,7 +4,6 @@ import collections
 import h5py
 import numpy as np
 import os
-import pandas
 import sys
 
 SC_GRADES_DICT = {0.0: 'O',
@@ -83,11 +82,11 @@ def extract_sc(entry_fn, dataset, sc_suffix, out_fn):
                                   'sc_name': long_temp_name(name),
                                   'center_channel': center_channel[name]}
                            for name in cluster_names}}
-    return bark.write_events(os.path.join(entry_fn, out_fn),
-                             pandas.DataFrame({'start': [event.time for event in event_list],
-                                               'name': [event.name for event in event_list],
-                                               'amplitude': [event.amplitude for event in event_list]}),
-                             **attrs)
+    with bark.EventWriter(os.path.join(entry_fn, out_fn),
+                          fields=('start', 'name', 'amplitude'),
+                          **attrs) as writer:
+        writer.writerows((event.time, event.name, event.amplitude)
+                         for event in event_list)
 
 def _parse_args(raw_args):
     desc = 'Extract Spyking Circus spike-sorting info into a Bark-readable form.'
@@ -0,0 +1,142 @@
+'''Reading WAV files in place as sampled datasets
+
+The samples of an uncompressed WAV file are stored like those of a bark
+sampled dataset, interleaved, after a header. Instead of copying them, a meta
+file with the header size in its `byte_offset` attribute lets bark memory map
+the WAV file directly.
+
+typical use:
+write_wav_metadata('song.wav')  # then read_sampled('song.wav') as usual
+'''
+import os
+import struct
+from bark import read_sampled, write_metadata, SampledData
+
+# WAVE_FORMAT tags
+_PCM = 1
+_FLOAT = 3
+_EXTENSIBLE = 0xFFFE
+
+
+def _dtype(tag, bits, path):
+    if tag == _PCM and bits == 8:
+        return 'u1'
+    if tag == _PCM and bits in (16, 32, 64):
+        return '<i{}'.format(bits // 8)
+    if tag == _FLOAT and bits in (32, 64):
+        return '<f{}'.format(bits // 8)
+    raise ValueError('{}: {} bit samples of format {} cannot be memory '
+                     'mapped'.format(path, bits, tag))
+
+
+def wav_metadata(path):
+    '''Reads the header of a WAV file.
+
+    Returns a dictionary of sampled dataset attributes: sampling_rate, dtype,
+    columns, and the byte_offset and byte_count of the samples in the file.
+    Raises ValueError if the file is not an uncompressed WAV file, or has 24
+    bit samples, which cannot be memory mapped.
+    '''
+    with open(path, 'rb') as fp:
+        riff, _, wave = struct.unpack('<4sI4s', fp.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError('{} is not a WAV file'.format(path))
+        fmt = None
+        while True:
+            header = fp.read(8)
+            if len(header) < 8:
+                raise ValueError('{} has no data chunk'.format(path))
+            chunk, size = struct.unpack('<4sI', header)
+            if chunk == b'fmt ':
+                body = fp.read(size + size % 2)
+                tag, n_channels, sampling_rate = struct.unpack('<HHI',
+                                                               body[:8])
+                bits, = struct.unpack('<H', body[14:16])
+                if tag == _EXTENSIBLE:
+                    tag, = struct.unpack('<H', body[24:26])
+                fmt = tag, n_channels, sampling_rate, bits
+            elif chunk == b'data':
+                if fmt is None:
+                    raise ValueError('{} has no fmt chunk'.format(path))
+                offset = fp.tell()
+                # a size of 0 or too large is common in streamed files
+                available = os.path.getsize(path) - offset
+                if size == 0 or size > available:
+                    size = available
+                break
+            else:
+                fp.seek(size + size % 2, os.SEEK_CUR)
+    tag, n_channels, sampling_rate, bits = fmt
+    return {'sampling_rate': sampling_rate,
+            'dtype': _dtype(tag, bits, path),
+            'columns': {i: {'units': None} for i in range(n_channels)},
+            'byte_offset': offset,
+            'byte_count': size}
+
+
+def write_wav_metadata(wavfile, datfile=None, **attrs):
+    '''Writes a meta file that makes a WAV file readable as a sampled dataset.
+
+    wavfile -- the WAV file
+    datfile -- name of the dataset; by default the WAV file itself. Otherwise
+               the dataset refers to the WAV file by its `data_file`
+               attribute, for example to use it from another entry, and
+               an empty placeholder file is written at `datfile`.
+    attrs   -- additional dataset attributes
+
+    Returns the dataset; its data is a memmap of the WAV file.
+    '''
+    params = wav_metadata(wavfile)
+    if datfile is not None:
+        directory = os.path.dirname(os.path.abspath(datfile))
+        params['data_file'] = os.path.relpath(os.path.abspath(wavfile),
+                                              directory)
+        open(datfile, 'wb').close()
+    else:
+        datfile = wavfile
+    params.update(attrs)
+    write_metadata(datfile, **params)
+    return read_sampled(datfile)
+
+
+def read_wav(wavfile):
+    '''Reads a WAV file as a sampled dataset, without a meta file and
+    without copying. The data is a read only (samples, channels) memmap.
+
+    Formats that cannot be memory mapped, such as 24 bit samples, are read
+    into memory with scipy instead.'''
+    try:
+        attrs = wav_metadata(wavfile)
+    except ValueError:
+        return _read_wav_scipy(wavfile)
+    return read_sampled(wavfile, attrs=attrs)
+
+
+def _read_wav_scipy(wavfile):
+    from scipy.io import wavfile as scipy_wavfile
+    sampling_rate, data = scipy_wavfile.read(wavfile)
+    data = data.reshape(len(data), -1)
+    attrs = {'sampling_rate': sampling_rate,
+             'dtype': data.dtype.str,
+             'columns': {i: {'units': None} for i in range(data.shape[1])}}
+    return SampledData(data, os.path.abspath(wavfile), attrs)
+
+
+def _wav_meta():
+    'commandline script to make WAV files readable in place'
+    import argparse
+    p = argparse.ArgumentParser(description='''
+    Write meta files for WAV files, so that bark reads them in place as
+    sampled datasets, without converting them''')
+    p.add_argument('wav', nargs='+', help='WAV files')
+    p.add_argument('-a',
+                   '--attributes',
+                   action='append',
+                   type=lambda kv: kv.split('='),
+                   dest='keyvalues',
+                   help='extra metadata in the form of KEY=VALUE')
+    args = p.parse_args()
+    attrs = dict(args.keyvalues) if args.keyvalues else {}
+    for wav in args.wav:
+        write_wav_metadata(wav, **attrs)
+
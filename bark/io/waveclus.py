@@ -1,11 +1,11 @@
-from scipy.io import loadmat
-import pandas as pd
 import argparse
 import bark
 
 
 def load_clusters(matfile, channel=None):
     """ From a wave_clus *.m file, return a pandas dataframe."""
+    from scipy.io import loadmat
+    import pandas as pd
 
     cluster_classes = loadmat(matfile)["cluster_class"]
     times = pd.DataFrame({"name": cluster_classes[:, 0].astype(int),
@@ -33,6 +33,7 @@ def _waveclus2csv():
                    dest='keyvalues',
                    help="extra metadata in the form of KEY=VALUE")
     args = p.parse_args()
+    import pandas as pd
     if args.keyvalues:
         attrs = dict(args.keyvalues)
     else:
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# -*- mode: python -*-
+"""
+Min/max decimation pyramid of sampled datasets, for drawing waveforms.
+
+Level `k` of the pyramid holds the minimum and maximum of each channel over
+consecutive bins of `4**k` samples, for k = 1, 2, ... up to the first level
+with no more than `MIN_BINS` bins; shorter datasets need no pyramid. Drawing
+the envelope from the right level shows every peak of the signal, unlike
+subsampling, and reads a bounded amount of data whatever the time range.
+
+The pyramid of `x.dat` is saved in `x.dat.minmax.npy`, an array of shape
+(bins, channels, 2) holding the levels one after the other. It is rebuilt
+if the dataset has changed since.
+"""
+from __future__ import division, print_function, absolute_import, \
+        unicode_literals
+import os
+
+FACTOR = 4  # decimation between levels
+MIN_BINS = 256  # bins of the coarsest level
+BUILD_BLOCK_SIZE = 2**20  # samples read at a time; a multiple of FACTOR
+
+
+def level_sizes(n_samples):
+    "Number of bins of each level of the pyramid of `n_samples` samples."
+    sizes = []
+    while n_samples > MIN_BINS:
+        n_samples = -(-n_samples // FACTOR)
+        sizes.append(n_samples)
+    return sizes
+
+
+def _decimate(x, factor):
+    "Minimum and maximum of bins of `factor` rows, as (bins, channels, 2)."
+    import numpy as np
+    idx = np.arange(0, x.shape[0], factor)
+    if x.ndim == 3:
+        return np.stack((np.minimum.reduceat(x[..., 0], idx),
+                         np.maximum.reduceat(x[..., 1], idx)), axis=-1)
+    return np.stack((np.minimum.reduceat(x, idx), np.maximum.reduceat(x, idx)),
+                    axis=-1)
+
+
+class MinMaxPyramid():
+    """The min/max pyramid of a sampled dataset.
+
+    Args:
+        dataset (SampledData): the dataset
+        levels (list of numpy.ndarray): level `k` (from 1) is an array of
+            shape (bins, channels, 2) of the minimum and maximum of each bin
+            of `4**k` samples
+
+    Usually created by :func:`read_pyramid`.
+    """
+    def __init__(self, dataset, levels):
+        self.dataset = dataset
+        self.levels = levels
+
+    def envelope(self, t0, t1, width, channels=None):
+        """The envelope of the data between two times, for display.
+
+        Args:
+            t0 (float): start time, in seconds from the start of the entry
+            t1 (float): stop time, in seconds
+            width (int): number of points wanted, such as the width of the
+                plot in pixels; at least this many are returned, unless the
+                range has fewer samples
+            channels: optional channel index or slice
+
+        Returns:
+            tuple: times (seconds) of the bins, and their minimum and maximum
+            values, of shape (bins, channels). When the range has fewer than
+            `4 * width` samples, the bins are the samples themselves, and
+            the minimum and maximum are equal.
+        """
+        dset = self.dataset
+        samples, mins, maxs = self.sample_envelope(dset._sample(t0),
+                                                   dset._sample(t1), width,
+                                                   channels)
+        return (samples + dset.offset) / dset.sampling_rate, mins, maxs
+
+    def sample_envelope(self, start, stop, width, channels=None):
+        """As :meth:`envelope`, between samples `start` and `stop` of the
+        dataset, ignoring its offset.
+
+        Returns:
+            tuple: the first sample of each bin, and the minimum and maximum
+            values of the bins
+        """
+        import numpy as np
+        dset = self.dataset
+        stop = min(max(stop, 0), dset.data.shape[0])
+        start = min(max(start, 0), stop)
+        step = (stop - start) // max(int(width), 1)
+        level = 0
+        while level < len(self.levels) and FACTOR**(level + 1) <= step:
+            level += 1
+        if level == 0:
+            mins = maxs = np.asarray(dset.data[start:stop])
+            factor, first = 1, start
+        else:
+            factor = FACTOR**level
+            first = start // factor
+            bins = self.levels[level - 1][first:-(-stop // factor)]
+            mins, maxs = bins[..., 0], bins[..., 1]
+            first *= factor
+        samples = first + np.arange(len(mins)) * factor
+        if channels is not None:
+            mins, maxs = mins[:, channels], maxs[:, channels]
+        return samples, mins, maxs
+
+
+def build_pyramid(dataset, path=None):
+    """Computes the pyramid of a dataset in one pass, and writes it to `path`,
+    by default the dataset's sidecar file.
+
+    Returns:
+        MinMaxPyramid: the pyramid, its levels memory mapped from the file,
+        or held in memory if the file cannot be written
+    """
+    import numpy as np
+    from numpy.lib.format import open_memmap
+    if path is None:
+        path = dataset.path + '.minmax.npy'
+    data = dataset.data
+    sizes = level_sizes(data.shape[0])
+    if not sizes:
+        return MinMaxPyramid(dataset, [])
+    shape = (sum(sizes), data.shape[1], 2)
+    tmp = path + '.tmp.npy'
+    try:
+        out = open_memmap(tmp, mode='w+', dtype=data.dtype, shape=shape)
+    except OSError:  # a read-only directory
+        tmp = None
+        out = np.empty(shape, dtype=data.dtype)
+    starts = np.cumsum([0] + sizes)
+    levels = [out[a:b] for a, b in zip(starts[:-1], starts[1:])]
+    for i in range(0, data.shape[0], BUILD_BLOCK_SIZE):
+        x = np.asarray(data[i:i + BUILD_BLOCK_SIZE])
+        j = i // FACTOR
+        levels[0][j:j + -(-len(x) // FACTOR)] = _decimate(x, FACTOR)
+    for below, level in zip(levels[:-1], levels[1:]):
+        block = BUILD_BLOCK_SIZE // FACTOR
+        for i in range(0, len(below), block):
+            x = below[i:i + block]
+            j = i // FACTOR
+            level[j:j + -(-len(x) // FACTOR)] = _decimate(x, FACTOR)
+    if tmp is None:
+        return MinMaxPyramid(dataset, levels)
+    out.flush()
+    del out, levels
+    os.replace(tmp, path)
+    return read_pyramid(dataset, path, build=False)
+
+
+def read_pyramid(dataset, path=None, build=True):
+    """Returns the pyramid of a dataset from its sidecar file.
+
+    Args:
+        dataset (SampledData): the dataset
+        path (str): the pyramid file, by default the dataset's sidecar
+        build (bool): if `True`, build the pyramid if the file is missing or
+            older than the data
+
+    Returns:
+        MinMaxPyramid: the pyramid, or `None` if there is none and `build`
+        is `False`
+    """
+    import numpy as np
+    if path is None:
+        path = dataset.path + '.minmax.npy'
+    sizes = level_sizes(dataset.data.shape[0])
+    if not sizes:  # short enough to draw from the data itself
+        return MinMaxPyramid(dataset, [])
+    try:
+        stack = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        stack = None
+    if (stack is None or stack.shape != (sum(sizes), dataset.data.shape[1],
+                                         2) or
+            stack.dtype != dataset.data.dtype or
+            dataset.data_mtime > os.path.getmtime(path)):
+        return build_pyramid(dataset, path) if build else None
+    starts = np.cumsum([0] + sizes)
+    return MinMaxPyramid(dataset, [stack[a:b] for a, b in
+                                   zip(starts[:-1], starts[1:])])
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# -*- mode: python -*-
+"""
+Summary statistics of sampled datasets, kept in a sidecar file.
+
+The samples are divided into blocks of `block_size` samples, and for each
+block and channel the number of samples, sum, sum of squares, minimum and
+maximum are stored, along with an amplitude histogram of each channel over
+the whole dataset. The means, standard deviations and extremes of any range
+of samples are then found from the blocks it covers, reading only the
+partial blocks at its ends from the data.
+
+The statistics of `x.dat` are saved in `x.dat.stats.npz`. When the dataset
+has grown since, as when samples are appended, only the new samples are
+read; if it has been rewritten, the statistics are computed again.
+"""
+from __future__ import division, print_function, absolute_import, \
+        unicode_literals
+import os
+
+STATS_BLOCK_SIZE = 65536  # samples per block
+HIST_BINS = 1024  # amplitude histogram bins per channel
+_FIELDS = ('count', 'sums', 'sumsqs', 'mins', 'maxs', 'edges', 'hist')
+
+
+def _block_stats(x):
+    "Count, sum, sum of squares, minimum and maximum of each channel of `x`."
+    import numpy as np
+    x = np.asarray(x)
+    y = x.astype(np.float64)
+    return (len(x), y.sum(0), np.einsum('ij,ij->j', y, y), x.min(0),
+            x.max(0))
+
+
+def _hist_edges(data, first):
+    """Histogram bin edges for each channel: the full range of an integer
+    type, or four times the range of the first block of floats."""
+    import numpy as np
+    n_columns = data.shape[1]
+    if data.dtype.kind in 'iu':
+        info = np.iinfo(data.dtype)
+        lo, hi = max(info.min, -2**31), min(info.max, 2**31 - 1) + 1
+        edges = np.linspace(lo, hi, HIST_BINS + 1)
+        return np.tile(edges, (n_columns, 1))
+    if len(first):
+        bound = 4 * np.abs(np.asarray(first, dtype=np.float64)).max(0)
+    else:
+        bound = np.zeros(n_columns)
+    bound[~(bound > 0) | ~np.isfinite(bound)] = 1
+    return np.linspace(-bound, bound, HIST_BINS + 1).T
+
+
+def _histogram(x, edges):
+    "Histograms of the channels of `x`; values outside go in the end bins."
+    import numpy as np
+    hist = np.zeros((edges.shape[0], edges.shape[1] - 1), dtype=np.int64)
+    for c in range(edges.shape[0]):
+        column = np.clip(np.asarray(x[:, c], dtype=np.float64),
+                         edges[c, 0], edges[c, -1])
+        hist[c] = np.histogram(column, edges[c])[0]
+    return hist
+
+
+class SampledStats():
+    """Per-block statistics of a sampled dataset.
+
+    Args:
+        dataset (SampledData): the dataset summarized
+        block_size (int): samples per block
+        count, sums, sumsqs, mins, maxs (numpy.ndarray): statistics of each
+            block, of shape (blocks, ) for `count` and (blocks, channels) for
+            the others
+        edges, hist (numpy.ndarray): amplitude histogram bin edges and
+            counts, of shape (channels, bins + 1) and (channels, bins)
+
+    Usually created by :func:`read_stats`. Ranges are given in samples from
+    the start of the dataset, and default to the whole dataset.
+    """
+    def __init__(self, dataset, block_size, count, sums, sumsqs, mins, maxs,
+                 edges, hist):
+        self.dataset = dataset
+        self.block_size = block_size
+        self.count = count
+        self.sums = sums
+        self.sumsqs = sumsqs
+        self.mins = mins
+        self.maxs = maxs
+        self.edges = edges
+        self.hist = hist
+
+    @property
+    def n_samples(self):
+        return int(self.count.sum())
+
+    def summary(self, start=0, stop=None):
+        """Returns the (count, sum, sum of squares, minimum, maximum) of each
+        channel over samples `start` to `stop`.
+
+        Only the partial blocks at either end of the range are read from the
+        data.
+        """
+        import numpy as np
+        n = self.n_samples
+        stop = n if stop is None else min(max(stop, 0), n)
+        start = min(max(start, 0), stop)
+        first = -(-start // self.block_size)  # first whole block
+        last = stop // self.block_size  # end of the whole blocks
+        parts = []
+        if first >= last:
+            if start < stop:
+                parts.append(_block_stats(self.dataset.data[start:stop]))
+        else:
+            if start < first * self.block_size:
+                parts.append(_block_stats(
+                    self.dataset.data[start:first * self.block_size]))
+            if last * self.block_size < stop:
+                parts.append(_block_stats(
+                    self.dataset.data[last * self.block_size:stop]))
+            blocks = slice(first, last)
+            parts.append((self.count[blocks].sum(),
+                          self.sums[blocks].sum(0),
+                          self.sumsqs[blocks].sum(0),
+                          self.mins[blocks].min(0),
+                          self.maxs[blocks].max(0)))
+        parts = [p for p in parts if p[0] > 0]
+        if not parts:
+            n_columns = self.sums.shape[1]
+            nan = np.full(n_columns, np.nan)
+            return 0, np.zeros(n_columns), np.zeros(n_columns), nan, nan
+        return (sum(p[0] for p in parts), sum(p[1] for p in parts),
+                sum(p[2] for p in parts), np.min([p[3] for p in parts], 0),
+                np.max([p[4] for p in parts], 0))
+
+    def mean(self, start=0, stop=None):
+        "Mean of each channel over samples `start` to `stop`."
+        count, total, _, _, _ = self.summary(start, stop)
+        return total / count if count else total * float('nan')
+
+    def std(self, start=0, stop=None):
+        "Standard deviation of each channel over samples `start` to `stop`."
+        import numpy as np
+        count, total, sumsq, _, _ = self.summary(start, stop)
+        if not count:
+            return total * float('nan')
+        mean = total / count
+        return np.sqrt(np.maximum(sumsq / count - mean**2, 0))
+
+    def min(self, start=0, stop=None):
+        "Minimum of each channel over samples `start` to `stop`."
+        return self.summary(start, stop)[3]
+
+    def max(self, start=0, stop=None):
+        "Maximum of each channel over samples `start` to `stop`."
+        return self.summary(start, stop)[4]
+
+    def extend(self):
+        """Adds the samples appended to the dataset since the statistics were
+        computed.
+
+        Returns:
+            bool: `True` if there were new samples
+        """
+        import numpy as np
+        data = self.dataset.data
+        n = self.n_samples
+        if data.shape[0] == n:
+            return False
+        # the last block may be partial: take it back out and recompute it
+        keep = n // self.block_size
+        start = keep * self.block_size
+        hist = self.hist - _histogram(data[start:n], self.edges)
+        blocks = []
+        for i in range(start, data.shape[0], self.block_size):
+            x = np.asarray(data[i:i + self.block_size])
+            blocks.append(_block_stats(x))
+            hist += _histogram(x, self.edges)
+        self.hist = hist
+        for name, values in zip(('count', 'sums', 'sumsqs', 'mins', 'maxs'),
+                                zip(*blocks)):
+            old = getattr(self, name)[:keep]
+            setattr(self, name, np.concatenate(
+                (old, np.array(values, dtype=old.dtype))))
+        return True
+
+    def save(self, path=None):
+        "Writes the statistics to `path`, by default the sidecar file."
+        import numpy as np
+        if path is None:
+            path = self.dataset.path + '.stats.npz'
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as fp:
+            np.savez(fp, block_size=self.block_size,
+                     **{x: getattr(self, x) for x in _FIELDS})
+        os.replace(tmp, path)
+
+
+def compute_stats(dataset, block_size=STATS_BLOCK_SIZE):
+    """Computes the statistics of a sampled dataset in one pass.
+
+    Returns:
+        SampledStats: the statistics, not yet saved
+    """
+    import numpy as np
+    data = dataset.data
+    n_columns = data.shape[1]
+    edges = _hist_edges(data, data[:block_size])
+    stats = SampledStats(dataset, block_size,
+                         np.zeros(0, dtype=np.int64),
+                         np.zeros((0, n_columns)), np.zeros((0, n_columns)),
+                         np.zeros((0, n_columns), dtype=data.dtype),
+                         np.zeros((0, n_columns), dtype=data.dtype), edges,
+                         np.zeros((n_columns, HIST_BINS), dtype=np.int64))
+    stats.extend()
+    return stats
+
+
+def read_stats(dataset, save=True):
+    """Returns the statistics of a sampled dataset.
+
+    They are read from the dataset's sidecar file if it is up to date,
+    extended if samples were appended to the dataset since it was written,
+    and otherwise computed again.
+
+    Args:
+        dataset (SampledData): the dataset
+        save (bool): if `True`, save new or updated statistics to the sidecar
+
+    Returns:
+        SampledStats: the statistics
+    """
+    import numpy as np
+    path = dataset.path + '.stats.npz'
+    stats = None
+    try:
+        with np.load(path) as npz:
+            stats = SampledStats(dataset, int(npz['block_size']),
+                                 *[npz[x] for x in _FIELDS])
+    except (OSError, KeyError, ValueError):
+        pass
+    changed = True
+    if (stats is None or stats.sums.shape[1:] != dataset.data.shape[1:] or
+            stats.mins.dtype != dataset.data.dtype or
+            stats.n_samples > dataset.data.shape[0] or
+            (stats.n_samples == dataset.data.shape[0] and
+             dataset.data_mtime > os.path.getmtime(path))):
+        stats = compute_stats(dataset)
+    else:
+        changed = stats.extend()
+    if save and changed:
+        try:
+            stats.save(path)
+        except OSError:
+            pass  # a read-only directory
+    return stats
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from itertools import chain
 import numpy as np
 import bark
@@ -6,20 +7,30 @@ import bark
 def array_iterator(data, chunksize):
     # check if data is empty
     if data.shape[0] == 0:
-        raise StopIteration('''Cannot stream from an empty array, 
-                file may be empty.''')
+        # Cannot stream from an empty array, file may be empty.
+        return
     index = 0
     while True:
         try:
             result = data[index:index + chunksize]
         except IndexError:
-            raise StopIteration
+            return
         if result.shape[0] == 0:
-            raise StopIteration
+            return
         yield result
         index += chunksize
 
 
+def reverse_array_iterator(data, chunksize):
+    """Iterates over data from its end, in chunks of chunksize samples.
+    Each chunk is reversed, and a view if data is an array or memmap."""
+    stop = data.shape[0]
+    while stop > 0:
+        start = max(stop - chunksize, 0)
+        yield data[start:stop][::-1]
+        stop = start
+
+
 class Stream():
     def __init__(self, data, sr=None, attrs=None, chunksize=2e6):
         """
@@ -34,6 +45,13 @@ class Stream():
         if isinstance(data,
                       np.ndarray):  # note: memmap is an ndarray subclass too
             self.data = array_iterator(data, self.chunksize)
+        elif callable(getattr(data, 'chunks', None)):
+            # compressed or virtual data, read a chunk at a time; h5py
+            # datasets have a chunks attribute too, but not a method
+            self.data = data.chunks(self.chunksize)
+        elif hasattr(data, 'shape') and hasattr(data, '__getitem__'):
+            # other array-likes, such as h5py datasets
+            self.data = array_iterator(data, self.chunksize)
         else:
             self.data = data
         if sr is None and attrs and "sampling_rate" in attrs:
@@ -93,7 +111,7 @@ class Stream():
 
     def call(self):
         "Returns the data as a numpy array."
-        return np.vstack(self)
+        return np.vstack(list(self))
 
     def pop(self):
         "Returns the first buffer of the stream."
@@ -102,25 +120,22 @@ class Stream():
     def write(self, filename, dtype=None, **new_attrs):
         """ Saves to disk as raw binary """
         attrs = self.attrs.copy()
-        attrs["sampling_rate"] = self.sr
-        if dtype:
-            with open(filename, "wb") as fp:
-                for data in self:
-                    fp.write(data.astype(dtype).tobytes())
-        else:
-            # we don't know the datatype until we stream
-            with open(filename, "wb") as fp:
-                for data in self:
-                    fp.write(data.tobytes())
-            dtype = data.dtype.str
-        attrs["dtype"] = dtype
-        try:
-            bark.sampled_columns(data, attrs['columns'])
-        except (ValueError, KeyError):
-            print('warning, column attribute was mangled ... reseting')
-            attrs['columns'] = bark.sampled_columns(data)
-        attrs.update(new_attrs)
-        bark.write_metadata(filename, **attrs)
+        attrs.pop("sampling_rate", None)
+        attrs.pop("dtype", None)  # if None, we don't know it until we stream
+        attrs.pop("compression", None)  # always written uncompressed
+        attrs.pop("members", None)
+        attrs.pop("layout", None)
+        for name in bark.bark._FOREIGN_ATTRS:
+            attrs.pop(name, None)
+        with bark.SampledWriter(filename, self.sr, dtype, **attrs) as writer:
+            for data in self:
+                writer.write(data)
+            try:
+                bark.sampled_columns(data, attrs['columns'])
+            except (ValueError, KeyError):
+                print('warning, column attribute was mangled ... reseting')
+                writer.attrs['columns'] = bark.sampled_columns(data)
+            writer.attrs.update(new_attrs)
 
     def map(self, func, vectorize=False):
         """ Maps a function to data,
@@ -164,15 +179,57 @@ class Stream():
         # last chunk
         yield np.vstack((left_pad, cur_x, edge_pad))
 
-    def vector_map(self, func):
+    def vector_map(self, func, overlap=None):
         """
         Calls func on overlapping chunks of data
         useful for timeseries functions like filters.
 
         func MUST return values the same shape as
         the it's input, ie don't use this function for resampling!
+
+        overlap: samples of context func needs on either side of each
+        chunk, such as a filter's padding or a kernel's half width.
+        If given, func is called once per chunk, with that context;
+        otherwise on every pair of consecutive chunks, which is about
+        twice the work.
         """
-        return self.new_stream(self._vector_map(func)).rechunk()
+        if overlap is None:
+            return self.new_stream(self._vector_map(func)).rechunk()
+        return self.new_stream(self._overlap_map(func,
+                                                 int(overlap))).rechunk()
+
+    def _overlap_map(self, func, overlap):
+        """ helper function
+
+        Run function once per chunk, on the chunk and up to overlap
+        samples of its neighbours on either side, copied into a reused
+        buffer. Returns the part of the result for the chunk itself.
+        """
+        chunks = rechunk(self, max(self.chunksize, overlap))
+        prev = None
+        cur = next(chunks, None)
+        if cur is None:
+            return
+        buf = None
+        for nxt in chain(chunks, [None]):
+            left = cur[:0] if prev is None else prev[len(prev) - overlap:]
+            right = cur[:0] if nxt is None else nxt[:overlap]
+            a, b = len(left), len(left) + len(cur)
+            n = b + len(right)
+            if (buf is None or len(buf) < n or buf.dtype != cur.dtype or
+                    buf.shape[1:] != cur.shape[1:]):
+                buf = np.empty((len(cur) + 2 * overlap, ) + cur.shape[1:],
+                               dtype=cur.dtype)
+            buf[:a] = left
+            buf[a:b] = cur
+            buf[b:n] = right
+            y = func(buf[:n])
+            # at the end, keep anything func adds, like the old behaviour
+            y = y[a:] if nxt is None else y[a:b]
+            if np.may_share_memory(y, buf):
+                y = y.copy()
+            yield y
+            prev, cur = cur, nxt
 
     def _vector_map(self, func):
         """ helper function
@@ -204,7 +261,7 @@ class Stream():
             if len(y) > C + 2 * N:
                 yield y[C + 2 * N:]
         except IndexError:
-            raise StopIteration
+            return
 
     def __getitem__(self, ix):
         """ use python syntax for splitting columns out of the stream """
@@ -218,8 +275,12 @@ class Stream():
 
     def split(self, *args):
         if 'columns' in self.attrs:
-            self.attrs['columns'] = {i: self.attrs['columns'][x]
-                                     for i, x in enumerate(args)}
+            columns = self.attrs['columns']
+            if isinstance(columns, bark.Columns):
+                self.attrs['columns'] = columns.take(args)
+            else:
+                self.attrs['columns'] = {i: columns[x]
+                                         for i, x in enumerate(args)}
         return self.new_stream((x[:, args]) for x in self)
 
     def merge(*streams):
@@ -227,7 +288,11 @@ class Stream():
         s = streams[0].new_stream((np.hstack(data) for data in zip(*streams)))
         i = 0
         newcols = {}
-        if 'columns' in s.attrs:
+        if all(isinstance(x.attrs.get('columns'), bark.Columns)
+               for x in streams):
+            s.attrs['columns'] = bark.Columns.concat(
+                *[x.attrs['columns'] for x in streams])
+        elif 'columns' in s.attrs:
             for oldstream in streams:
                 oldcols = oldstream.attrs['columns']
                 for oldi in range(len(oldcols)):
@@ -251,47 +316,43 @@ class Stream():
                 x[:, i].astype(np.float32)
                 .reshape(-1, 1), (kernel_size, 1)) for i in range(x.shape[1])])
 
-        return self.new_stream(self.vector_map(medfilt_func))
+        return self.new_stream(self.vector_map(medfilt_func,
+                                               overlap=kernel_size // 2))
 
     def _analog_filter(self,
                        ftype,
                        highpass=None,
                        lowpass=None,
                        order=3,
-                       zerophase=True):
-        ' Use a classic analog filter on the data, currently butter or bessel'
-        from scipy.signal import butter, bessel
-        filter_types = {'butter': butter, 'bessel': bessel}
-        afilter = filter_types[ftype]
-        if highpass is None and lowpass is not None:
-            b, a = afilter(order, lowpass / (self.sr / 2), btype='lowpass')
-        elif highpass is not None and lowpass is None:
-            b, a = afilter(order, highpass / (self.sr / 2), btype='highpass')
-        elif highpass is not None and lowpass is not None:
-            if highpass < lowpass:
-                b, a = afilter(order,
-                               (highpass / (self.sr / 2),
-                                lowpass / (self.sr / 2)),
-                               btype='bandpass')
-            else:
-                b, a = afilter(order,
-                               (lowpass / (self.sr / 2),
-                                highpass / (self.sr / 2)),
-                               btype='bandstop')
+                       zerophase=True,
+                       dtype=None,
+                       tempdir=None):
+        """ Use a classic analog filter on the data, currently butter or bessel
+
+        The filter is applied as second order sections, which stay stable
+        at high orders and narrow bands. dtype is the precision to filter
+        in, for example float32 to halve the memory and time of data that
+        fits in it; by default float64. For tempdir, see filtfilt.
+        """
+        sos = _filter_design(ftype, order, highpass, lowpass, self.sr)
+        if dtype is not None:
+            sos = sos.astype(dtype)
         if zerophase:
-            return self.filtfilt(b, a)
+            return self.sosfiltfilt(sos, tempdir)
         else:
-            return self.lfilter(b, a)
+            return self.sosfilt(sos)
 
-    def butter(self, highpass=None, lowpass=None, order=3, zerophase=True):
+    def butter(self, highpass=None, lowpass=None, order=3, zerophase=True,
+               dtype=None, tempdir=None):
         ' Buttworth filter the data'
         return self._analog_filter('butter', highpass, lowpass, order,
-                                   zerophase)
+                                   zerophase, dtype, tempdir)
 
-    def bessel(self, highpass=None, lowpass=None, order=3, zerophase=True):
+    def bessel(self, highpass=None, lowpass=None, order=3, zerophase=True,
+               dtype=None, tempdir=None):
         ' Bessel filter the data'
         return self._analog_filter('bessel', highpass, lowpass, order,
-                                   zerophase)
+                                   zerophase, dtype, tempdir)
 
     def rechunk(self, chunksize=None):
         " calls the function rechunk and returns a Stream object."
@@ -299,23 +360,131 @@ class Stream():
             self.chunksize = chunksize
         return self.new_stream(rechunk(self, self.chunksize))
 
-    def filtfilt(self, b, a):
-        " Performs forward backward filtering on the stream."
-        from scipy.signal import filtfilt
+    def filtfilt(self, b, a, tempdir=None):
+        """ Performs forward backward filtering on the stream.
+
+        The result is that of scipy.signal.filtfilt on the whole stream.
+        The forward pass is written to a temporary file in tempdir, then
+        filtered backward a chunk at a time from its end. The file is as
+        large as the whole filtered stream, in float64 unless the filter
+        and data are float32, so tempdir needs that much free space; by
+        default it is the system's temporary directory, which may be
+        small or held in memory."""
+        from scipy.signal import lfilter, lfilter_zi
+
+        def filter_func(x, zi):
+            return lfilter(b, a, x, axis=0, zi=zi)
+
+        padlen = 3 * max(len(np.atleast_1d(a)), len(np.atleast_1d(b)))
+        return self.new_stream(self._two_pass_filter(
+            filter_func, lfilter_zi(b, a), padlen, np.result_type(b, a),
+            tempdir))
+
+    def sosfiltfilt(self, sos, tempdir=None):
+        """ Performs forward backward filtering on the stream with second
+        order sections, as scipy.signal.sosfiltfilt on the whole stream.
+        See filtfilt."""
+        from scipy.signal import sosfilt, sosfilt_zi
+        sos = np.array(sos, ndmin=2)  # scipy needs a writable array
+
+        def filter_func(x, zi):
+            return sosfilt(sos, x, axis=0, zi=zi)
+
+        ntaps = 2 * len(sos) + 1
+        ntaps -= min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum())
+        return self.new_stream(self._two_pass_filter(
+            filter_func, sosfilt_zi(sos), 3 * ntaps, sos.dtype, tempdir))
+
+    def _two_pass_filter(self, func, zi, padlen, dtype, tempdir):
+        """ helper function
 
-        def filter_func(x):
-            return filtfilt(b, a, x, axis=0)
+        Zero phase filtering of the whole stream in bounded memory.
+        func(x, zi) filters a chunk from state zi, returning the result and
+        the final state, and zi is the filter's steady state step response.
+        As in scipy's filtfilt, the signal is extended by padlen samples
+        at each end by odd reflection, and each pass starts from the
+        steady state of its first sample.
+        """
+        import tempfile
+        chunks = rechunk(self, max(self.chunksize, padlen + 1))
+        first = next(chunks, None)
+        if first is None:
+            return
+        if len(first) <= padlen:
+            raise ValueError('the stream must be longer than the padding, '
+                             '{} samples'.format(padlen))
+        dtype = np.result_type(dtype, first.dtype)
+        zi = np.asarray(zi, dtype=dtype)
+        with tempfile.TemporaryFile(dir=tempdir) as fp:
+            # forward pass, to the temporary file
+            first = np.asarray(first, dtype=dtype)
+            left = 2 * first[0] - first[padlen:0:-1]
+            _, state = func(left, np.multiply.outer(zi, left[0]))
+            n_samples = 0
+            prev = last = None
+            for x in chain((first, ), chunks):
+                x = np.asarray(x, dtype=dtype)
+                y, state = func(x, state)
+                fp.write(np.ascontiguousarray(y, dtype=dtype))
+                n_samples += len(x)
+                prev, last = last, x
+            if prev is not None:
+                last = np.concatenate((prev[-padlen - 1:], last))
+            tail = last[-padlen - 1:]
+            right, state = func(2 * tail[-1] - tail[-2::-1], state)
+            # backward pass, from the end of the extension, in place
+            _, state = func(right[::-1], np.multiply.outer(zi, right[-1]))
+            fp.flush()
+            out = np.memmap(fp, dtype=dtype, mode='r+',
+                            shape=(n_samples, first.shape[1]))
+            stop = n_samples
+            for x in reverse_array_iterator(out, self.chunksize):
+                y, state = func(x, state)
+                out[stop - len(y):stop] = y[::-1]
+                stop -= len(y)
+            for i in range(0, n_samples, self.chunksize):
+                yield out[i:i + self.chunksize]
+
+    def _stateful_filter(self, func, n_states, dtype):
+        """ helper function
 
-        return self.new_stream(self.vector_map(filter_func))
+        Filter each chunk with func(x, zi), which returns the filtered
+        chunk and the filter state at its end, carried into the next
+        chunk. The result is that of filtering the whole stream at once
+        from zero initial conditions, in the precision of dtype and the
+        data.
+        """
+        zi = None
+        for x in self:
+            if zi is None:
+                zi = np.zeros(n_states + (x.shape[1], ),
+                              dtype=np.result_type(dtype, x.dtype))
+            y, zi = func(x, zi)
+            yield y
 
     def lfilter(self, b, a):
-        " Forward only filtering"
+        " Forward only filtering, carrying the filter state between chunks."
         from scipy.signal import lfilter
 
-        def filter_func(x):
-            return lfilter(b, a, x, axis=0)
+        def filter_func(x, zi):
+            return lfilter(b, a, x, axis=0, zi=zi)
+
+        n_states = max(len(np.atleast_1d(a)), len(np.atleast_1d(b))) - 1
+        return self.new_stream(self._stateful_filter(
+            filter_func, (n_states, ), np.result_type(b, a)))
+
+    def sosfilt(self, sos):
+        """ Forward only filtering with second order sections, carrying the
+        filter state between chunks."""
+        from scipy.signal import sosfilt
+        sos = np.array(sos, ndmin=2)  # scipy needs a writable array
 
-        return self.new_stream(self.vector_map(filter_func))
+        def filter_func(x, zi):
+            return sosfilt(sos, x, axis=0, zi=zi)
+
+        return self.new_stream(self._stateful_filter(filter_func,
+                                                     (len(sos), 2),
+                                                     sos.dtype))
 
     def convolve(self, win):
         " Convolves each channel with window win."
@@ -325,7 +494,7 @@ class Stream():
             return np.column_stack([fftconvolve(x[:, i], win)
                                     for i in range(x.shape[1])])
 
-        return self.new_stream(self.vector_map(conv_func))
+        return self.new_stream(self.vector_map(conv_func, len(win) - 1))
 
     def decimate(self, factor):
         s = self.new_stream(decimate(self, factor)).rechunk()
@@ -351,6 +520,38 @@ class Stream():
         return self.map(func)
 
 
+def filter_design(ftype, order, highpass, lowpass, sr):
+    """Second order sections of a butter or bessel filter.
+
+    highpass and lowpass are in Hz; give either or both. If highpass is
+    above lowpass the filter is a bandstop."""
+    return np.array(_filter_design(ftype, order, highpass, lowpass, sr))
+
+
+@lru_cache(maxsize=64)
+def _filter_design(ftype, order, highpass, lowpass, sr):
+    """Cached filter_design, as a stream pipeline may build the same filter
+    many times. The result is read only, as it is shared."""
+    from scipy.signal import butter, bessel
+    filter_types = {'butter': butter, 'bessel': bessel}
+    afilter = filter_types[ftype]
+    nyquist = sr / 2
+    if highpass is None and lowpass is not None:
+        wn, btype = lowpass / nyquist, 'lowpass'
+    elif highpass is not None and lowpass is None:
+        wn, btype = highpass / nyquist, 'highpass'
+    elif highpass is not None and lowpass is not None:
+        if highpass < lowpass:
+            wn, btype = (highpass / nyquist, lowpass / nyquist), 'bandpass'
+        else:
+            wn, btype = (lowpass / nyquist, highpass / nyquist), 'bandstop'
+    else:
+        raise ValueError('a highpass or lowpass frequency is required')
+    sos = afilter(order, wn, btype=btype, output='sos')
+    sos.flags.writeable = False
+    return sos
+
+
 def decimate(stream, factor):
     " Downsample signals by factor. Remember to filter first!"
     remainder = 0
@@ -360,17 +561,38 @@ def decimate(stream, factor):
 
 
 def rechunk(stream, chunksize):
-    "New iterator with correct chunksize."
-    buffer = None
+    """New iterator with correct chunksize.
+
+    Each sample is copied at most once, into a newly allocated output
+    chunk; whole output chunks within an input chunk are yielded as views.
+    """
+    pending = None  # a full chunk, yielded once more samples follow
+    out = None  # output chunk being filled
+    filled = 0
     for x in stream:
-        if buffer is None:
-            buffer = x
-        else:
-            buffer = np.vstack((buffer, x))
-        while len(buffer) > chunksize:
-            yield buffer[:chunksize, :]
-            buffer = buffer[chunksize:, :]
-    yield buffer  # leftover samples at end of stream
+        i = 0
+        while i < len(x):
+            if pending is not None:
+                yield pending
+                pending = None
+            if filled == 0 and len(x) - i >= chunksize:
+                pending = x[i:i + chunksize]
+                i += chunksize
+                continue
+            if out is None:
+                out = np.empty((chunksize, ) + x.shape[1:], dtype=x.dtype)
+            elif x.dtype != out.dtype:
+                out = out.astype(np.result_type(out, x))
+            n = min(chunksize - filled, len(x) - i)
+            out[filled:filled + n] = x[i:i + n]
+            filled += n
+            i += n
+            if filled == chunksize:
+                pending, out, filled = out, None, 0
+    if pending is not None:
+        yield pending
+    elif filled:
+        yield out[:filled]  # leftover samples at end of stream
 
 
 def read(fname, chunksize=2e6, **kwargs):
@@ -69,13 +69,49 @@ def meta_to_neuroscope_xml(meta):
     return ElementTree(parameters)
 
 
+def plot_overview(dat, start=None, stop=None, width=2000):
+    """Plots the min/max envelope of every channel of a sampled dataset.
+
+    Drawn from the dataset's min/max pyramid, so even hours of data are
+    shown quickly and without missing peaks.
+    """
+    import matplotlib.pyplot as plt
+    from bark import read_sampled
+    dset = read_sampled(dat)
+    pyramid = dset.pyramid()
+    t0 = dset.offset / dset.sampling_rate
+    if start is None:
+        start = t0
+    if stop is None:
+        stop = t0 + dset.data.shape[0] / dset.sampling_rate
+    t, mins, maxs = pyramid.envelope(start, stop, width)
+    n_channels = mins.shape[1]
+    fig, axes = plt.subplots(n_channels, 1, sharex=True, squeeze=False)
+    for c, ax in enumerate(axes[:, 0]):
+        ax.fill_between(t, mins[:, c], maxs[:, c], step='post',
+                        color='k', linewidth=0.5)
+        ax.set_ylabel(str(c))
+    axes[-1, 0].set_xlabel('time (s)')
+    axes[-1, 0].set_xlim(start, stop)
+    plt.show()
+
+
 def main():
     import argparse
     p = argparse.ArgumentParser(description="""
     Open raw binary file in neuroscope.
     """)
     p.add_argument("dat", help="Raw binary file to open.")
+    p.add_argument("--overview",
+                   action="store_true",
+                   help="""instead of opening neuroscope, plot the envelope of
+                   every channel, which is fast even for hours of data""")
+    p.add_argument("--start", type=float, help="start of the overview (s)")
+    p.add_argument("--stop", type=float, help="end of the overview (s)")
     args = p.parse_args()
+    if args.overview:
+        plot_overview(args.dat, args.start, args.stop)
+        return
     fname = os.path.splitext(args.dat)[0] + ".xml"
     if not os.path.isfile(fname):
         # load metadata
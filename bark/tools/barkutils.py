@@ -2,12 +2,7 @@ import os.path
 from glob import glob
 import bark
 import argparse
-from bark import stream
-import arrow
-from dateutil import tz
-import numpy
 import sys
-import subprocess
 
 
 def meta_attr():
@@ -67,6 +62,8 @@ def mk_entry():
                    help="timezone of timestamp, default: America/Chicago",
                    default='America/Chicago')
     args = p.parse_args()
+    import arrow
+    from dateutil import tz
     timestamp = arrow.get(args.timestamp).replace(
         tzinfo=tz.gettz(args.timezone)).datetime
     attrs = dict(args.keyvalues) if args.keyvalues else {}
@@ -101,6 +98,29 @@ def clean_metafiles():
     _clean_metafiles(args.path, args.recursive)
 
 
+def _events_convert():
+    p = argparse.ArgumentParser(
+        description="""Convert an event dataset between the CSV and the
+        binary (npy) formats""")
+    p.add_argument("input", help="input event dataset")
+    p.add_argument("out", help="name of output file")
+    p.add_argument("-f",
+                   "--format",
+                   choices=("csv", "npy"),
+                   help="output format, default: the other one")
+    args = p.parse_args()
+    events_convert(args.input, args.out, args.format)
+
+
+def events_convert(infile, outfile, format=None):
+    events = bark.read_events(infile)
+    attrs = events.attrs.copy()
+    in_format = attrs.pop('format', 'csv')
+    if format is None:
+        format = 'csv' if in_format == 'npy' else 'npy'
+    return bark.write_events(outfile, events.data, format=format, **attrs)
+
+
 def rb_concat():
     p = argparse.ArgumentParser(
         description="""Concatenate raw binary files by adding new samples.
@@ -113,15 +133,87 @@ def rb_concat():
                    dest='keyvalues',
                    help="extra metadata in the form of KEY=VALUE")
     p.add_argument("-o", "--out", help="name of output file", required=True)
+    p.add_argument("--virtual",
+                   action="store_true",
+                   help="""write a virtual dataset that refers to the input
+                   files instead of copying them""")
     args = p.parse_args()
     if args.keyvalues:
         attrs = dict(args.keyvalues)
     else:
         attrs = {}
+    if args.virtual:
+        from bark.concat import concatenate
+        concatenate(args.out, args.input, **attrs)
+        return
+    from bark import stream
     streams = [stream.read(x) for x in args.input]
     streams[0].chain(*streams[1:]).write(args.out, **attrs)
 
 
+def rb_compress():
+    p = argparse.ArgumentParser(description="""
+    Losslessly compress a sampled dataset. The result is read by bark like
+    any other sampled dataset, but cannot be modified in place.""")
+    p.add_argument("dat", help="dat file")
+    p.add_argument("-o", "--out", help="name of output dat file",
+                   required=True)
+    p.add_argument("-c",
+                   "--codec",
+                   choices=("zlib", "lzma", "bz2"),
+                   default="zlib",
+                   help="compression codec, default: zlib")
+    p.add_argument("-l", "--level", type=int, help="compression level")
+    p.add_argument("--block-size",
+                   type=int,
+                   help="samples per compressed block, default: about 256 KB "
+                   "of samples")
+    p.add_argument("--no-delta",
+                   action="store_true",
+                   help="do not delta code integer data")
+    opt = p.parse_args()
+    dset = bark.read_sampled(opt.dat)
+    attrs = dset.attrs.copy()
+    attrs.pop('compression', None)
+    compression = {'codec': opt.codec, 'level': opt.level,
+                   'block_size': opt.block_size, 'delta': not opt.no_delta}
+    bark.write_sampled(opt.out, dset.data, compression=compression, **attrs)
+
+
+def rb_decompress():
+    p = argparse.ArgumentParser(description="""
+    Decompress a sampled dataset to a raw binary file""")
+    p.add_argument("dat", help="compressed dat file")
+    p.add_argument("-o", "--out", help="name of output dat file",
+                   required=True)
+    opt = p.parse_args()
+    dset = bark.read_sampled(opt.dat)
+    attrs = dset.attrs.copy()
+    attrs.pop('compression', None)
+    bark.write_sampled(opt.out, dset.data, **attrs)
+
+
+def rb_layout():
+    p = argparse.ArgumentParser(description="""
+    Rewrite a sampled dataset with its samples interleaved (the default), or
+    with each channel stored contiguously (channel-major), which is faster to
+    read one channel at a time. Compressed datasets are decompressed.""")
+    p.add_argument("dat", help="dat file")
+    p.add_argument("-o", "--out", help="name of output dat file",
+                   required=True)
+    p.add_argument("-l",
+                   "--layout",
+                   choices=(bark.INTERLEAVED, bark.CHANNEL_MAJOR),
+                   default=bark.CHANNEL_MAJOR,
+                   help="layout of the output, default: channel-major")
+    opt = p.parse_args()
+    dset = bark.read_sampled(opt.dat)
+    attrs = dset.attrs.copy()
+    attrs.pop('layout', None)
+    attrs.pop('compression', None)  # compressed input is decompressed
+    bark.write_sampled(opt.out, dset.data, layout=opt.layout, **attrs)
+
+
 def rb_decimate():
     ' Downsample raw binary file.'
     p = argparse.ArgumentParser(description="Downsample raw binary file")
@@ -142,6 +234,7 @@ def rb_decimate():
         attrs = dict(args.keyvalues)
     else:
         attrs = {}
+    from bark import stream
     stream.read(args.input).decimate(args.factor).write(args.out, **attrs)
 
 
@@ -190,11 +283,20 @@ def rb_filter():
                    default="bessel")
 
     opt = p.parse_args()
+    import numpy as np
+    from bark import stream
     dtype = bark.read_metadata(opt.dat)['dtype']
+    # filter in float32 if it holds the data exactly, such as int16 samples
+    filter_dtype = np.result_type(dtype, np.float32)
+    # the zero phase filter needs a full length scratch file: put it by the
+    # output, rather than in a temporary directory that may be small
+    tempdir = os.path.dirname(os.path.abspath(opt.out))
     stream.read(opt.dat)._analog_filter(opt.filter,
                                         highpass=opt.highpass,
                                         lowpass=opt.lowpass,
-                                        order=opt.order).write(opt.out, dtype)
+                                        order=opt.order,
+                                        dtype=filter_dtype,
+                                        tempdir=tempdir).write(opt.out, dtype)
     attrs = bark.read_metadata(opt.out)
     attrs['highpass'] = opt.highpass
     attrs['lowpass'] = opt.lowpass
@@ -219,6 +321,7 @@ def rb_diff():
     dat, out, channels = opt.dat, opt.out, opt.channels
     if not channels:
         channels = (0, 1)
+    from bark import stream
     (stream.read(dat)[channels[0]] - stream.read(dat)[channels[1]]).write(out)
 
 
@@ -229,6 +332,7 @@ def rb_join():
     p.add_argument("dat", help="dat files", nargs="+")
     p.add_argument("-o", "--out", help="name of output dat file")
     opt = p.parse_args()
+    from bark import stream
     streams = [stream.read(fname) for fname in opt.dat]
     streams[0].merge(*streams[1:]).write(opt.out)
 
@@ -243,6 +347,8 @@ def rb_to_audio():
     attrs = bark.read_metadata(opt.dat)
     sr = str(attrs['sampling_rate'])
     ch = str(len(attrs['columns']))
+    import numpy
+    import subprocess
     dt = numpy.dtype(attrs['dtype'])
     bd = str(dt.itemsize * 8)
     if dt.name[:5] == 'float':
@@ -309,6 +415,7 @@ def datchunk(dat, stride, use_seconds):
         stride = stride * sr
     stride = int(stride)
     basename = os.path.splitext(dat)[0]
+    from bark import stream
     for i, chunk in enumerate(stream.read(dat, chunksize=stride)):
         filename = "{}-chunk-{}.dat".format(basename, i)
         attrs['offset'] = stride * i
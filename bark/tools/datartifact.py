@@ -1,16 +1,16 @@
-from bark import read_sampled, BUFFER_SIZE
-from shutil import copyfile
+import os.path
+from bark import read_sampled, write_sampled, BUFFER_SIZE
+from bark.stats import _block_stats
 import numpy as np
-from scipy.signal import argrelmax, argrelmin
-import matplotlib as mpl
-mpl.use('Agg')  # set noninteractive backend
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
 
 BUF = BUFFER_SIZE
 
 
 def make_artifact_plots(data, outname, pos_arts, neg_arts, stds):
+    import matplotlib as mpl
+    mpl.use('Agg')  # set noninteractive backend
+    import matplotlib.pyplot as plt
+    import matplotlib.cm as cm
     colors = [cm.Dark2(x) for x in np.linspace(0, 1, len(stds))]
     f, (ax1, ax2, ax3) = plt.subplots(3, 1)
     if len(pos_arts) == 0 and len(neg_arts) == 0:
@@ -37,17 +37,26 @@ def make_artifact_plots(data, outname, pos_arts, neg_arts, stds):
 
 
 def datartifact(datfile, outfile, std_lim):
+    from scipy.signal import argrelmax, argrelmin
     assert datfile != outfile
-    copyfile(datfile, outfile)
-    copyfile(datfile + ".meta.yaml", outfile + ".meta.yaml")
     dataset = read_sampled(datfile)
     data, params = dataset.data, dataset.attrs
-    out_dataset = read_sampled(outfile, mode="r+")
-    out, outparams = out_dataset.data, dataset.attrs
+    # a plain copy to modify, even if the input is compressed, virtual or
+    # in a foreign file such as a WAV file
+    outparams = dict(params)
+    outparams.pop('compression', None)
+    sampling_rate = outparams.pop('sampling_rate')
+    out_dataset = write_sampled(outfile, data, sampling_rate, **outparams)
+    out = out_dataset.data
     n_channels = len(params["columns"])
 
-    # compute standard deviation
-    stds = np.std(data[0:BUF * 50], axis=0)
+    # compute standard deviation, from the statistics sidecar if there is
+    # one, as making it reads the whole file
+    if os.path.exists(datfile + '.stats.npz'):
+        stds = dataset.stats().std(0, BUF * 50)
+    else:
+        count, total, sumsq, _, _ = _block_stats(data[:BUF * 50])
+        stds = np.sqrt(np.maximum(sumsq / count - (total / count)**2, 0))
     print("standard deviations: {}".format(stds))
     # find locations of artifacts
     pos_artifacts = [[] for x in range(n_channels)]
@@ -56,33 +56,32 @@ def get_segments(labels, window=5):
 
 def datenrich(dat, out, label_file, window):
     dataset = bark.read_sampled(dat)
-    data, params = dataset.data, dataset.attrs
-    rate = params["sampling_rate"]
-    total_samples = data.shape[0]
+    data, params = dataset.data, dict(dataset.attrs)
+    rate = params.pop("sampling_rate")
+    # label times are relative to the entry, as is the dataset's offset
+    begin = dataset.offset / rate
+    end = (dataset.offset + data.shape[0]) / rate
     # cut out labelled segments
     label_dset = bark.read_events(label_file)
     for x in label_dset.data.itertuples():
-        assert x.start > 0
-        assert x.start * rate < total_samples
-        assert x.stop > 0
-        assert x.stop * rate < total_samples
-        if x.start - window < 0:
+        assert begin < x.start < end
+        assert begin < x.stop < end
+        if x.start - window < begin:
                 print(
                     'warning, cannot place a full window at beginning of data')
     segs, newlabels = get_segments(label_dset.data, window)
-    # convert to samples
-    segs = np.array(segs * rate, dtype=int)
-    # write to new file
-    with open(out, "wb") as outfp:
+
+    def segments():
         for start, stop in segs:
-            assert stop > 0
-            assert start < total_samples
-            assert start >= 0
-            if stop >= total_samples:
+            assert begin < stop and start < end
+            if stop >= end:
                 print('warning, cannot place a full window at end of data')
-                stop = total_samples - 1
-            outfp.write(data[start:stop, :].tobytes())
-    bark.write_metadata(out, **params)
+            yield dataset.time_slice(start, stop)
+
+    # the segments are concatenated from the start of the new dataset; its
+    # storage, such as a layout or compression, is that of the input
+    params.pop('offset', None)
+    bark.write_sampled(out, segments(), rate, **params)
     bark.write_events(
         os.path.splitext(out)[0] + ".csv", newlabels, **label_dset.attrs)
 
@@ -3,7 +3,7 @@ import numpy as np
 import pandas as pd
 import os.path
 from scipy.signal import filtfilt, butter
-from scipy.io import wavfile
+from bark.io.wav import read_wav
 
 
 def abs_and_smooth(x, sr, lp=100):
@@ -42,31 +42,28 @@ def wav_envelopes(wavnames, new_sr=22050):
     for wav in wavnames:
         name = os.path.splitext(os.path.basename(wav))[0]
         names.append(name)
-        wavsr, wavdata = wavfile.read(wav)
-        amp_env = amplitude(wavdata, wavsr, new_sr)
+        dset = read_wav(wav)  # memory mapped, not read into memory
+        amp_env = amplitude(dset.data, dset.sampling_rate, new_sr)
         envelopes.append(amp_env)
     return names, envelopes
 
 
-def classify_stimuli(mic_data, mic_sr, starts, wav_names, wav_envs, common_sr):
+def classify_stimuli(mic_dset, starts, wav_names, wav_envs, common_sr):
+    mic_sr = mic_dset.sampling_rate
     # get longest stimuli to determine how much data to grab
-    max_stim_duration = int(max([len(x) for x in wav_envs]) / common_sr *
-                            mic_sr)
+    max_stim_duration = max([len(x) for x in wav_envs]) / common_sr
     max_stim_dur_common_sr = max([len(x) for x in wav_envs])
     padded_wav_envs = []
     for y in wav_envs:
         pad = np.zeros(max_stim_dur_common_sr)
         pad[:len(y)] = y
         padded_wav_envs.append(pad)
-    # convert trigfile starts to samples
-    start_samps = np.array(starts * mic_sr, dtype=int)
     labels = []
-    for start_samp in start_samps:
-        x = amplitude(mic_data[start_samp:start_samp + max_stim_duration],
-                      mic_sr, common_sr)
+    for start in starts:
+        x = amplitude(mic_dset.window(start, max_stim_duration), mic_sr,
+                      common_sr)
         if len(x) < max_stim_dur_common_sr:
-            print('skipping {} ... too close to end of file'.format(start_samp
-                                                                    / mic_sr))
+            print('skipping {} ... too close to end of file'.format(start))
             continue
         inner_prods = [pearson_r(x, y) for y in padded_wav_envs]
         best_match = wav_names[np.argmax(inner_prods)]
@@ -111,11 +108,10 @@ def main(datfile, trigfile, outfile, wavfiles):
     # get wav envelopes
     stim_names, stim_envs = wav_envelopes(wavfiles, common_sr)
     mic_dset = bark.read_sampled(datfile)
-    mic_sr = mic_dset.sampling_rate
     starts = bark.read_events(trigfile).data.start
     # get most likely stimulus for each trigger time
-    labels = classify_stimuli(mic_dset.data, mic_sr, starts, stim_names,
-                              stim_envs, common_sr)
+    labels = classify_stimuli(mic_dset, starts, stim_names, stim_envs,
+                              common_sr)
     stops = get_stops(labels, starts, stim_names, stim_envs, common_sr)
     write(outfile, starts, stops, labels)
 
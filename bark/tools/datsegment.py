@@ -26,14 +26,19 @@ def amplitude_stream(data, sr, fftn, step, lowcut, highcut):
         yield time, np.mean(np.log(np.abs(fft)))
 
 
-def amplitude_stream_td(data, sr, fftn, step, lowcut, highcut):
-    ' Time domain version of the amplitude stream'
-    datastream = bark.stream.Stream(data, sr)
+def amplitude_stream_td(data, sr, fftn, step, lowcut, highcut, tempdir=None):
+    """ Time domain version of the amplitude stream
+
+    The zero phase smoothing writes a scratch file as long as the recording
+    to tempdir, by default the system's temporary directory."""
+    from bark.stream import Stream
+    datastream = Stream(data, sr)
     amplitude = (datastream.butter(highpass=lowcut,
                                    lowpass=highcut,
                                    zerophase=False,
                                    order=1).map(abs)
-                 .bessel(lowpass=(step / sr)** -1).rechunk(step))
+                 .bessel(lowpass=(step / sr)** -1, tempdir=tempdir)
+                 .rechunk(step))
     i = 0
     for buffer in amplitude:
         yield i / sr, np.log(buffer[0])
@@ -111,15 +116,18 @@ def main(datname,
     sr = sampled.sampling_rate
     step = int((step_ms / 1000) * sr)  # convert to samples
     if time_domain:
-        amplitude_function = amplitude_stream_td
+        # put the smoothing's scratch file by the output, rather than in a
+        # temporary directory that may be small
+        amp_stream = amplitude_stream_td(
+            sampled.data, sr, fftn, step, lowcut=lowcut, highcut=highcut,
+            tempdir=os.path.dirname(os.path.abspath(outfile)))
     else:
-        amplitude_function = amplitude_stream
-    amp_stream = amplitude_function(sampled.data,
-                                    sr,
-                                    fftn,
-                                    step,
-                                    lowcut=lowcut,
-                                    highcut=highcut)
+        amp_stream = amplitude_stream(sampled.data,
+                                      sr,
+                                      fftn,
+                                      step,
+                                      lowcut=lowcut,
+                                      highcut=highcut)
     start, stop = first_pass(amp_stream, thresh)
     second_pass(start, stop, min_silent)
     third_pass(start, stop, min_syl)
@@ -1,6 +1,5 @@
 import numpy as np
 import bark
-from scipy.signal import argrelextrema
 
 default_order = 5
 
@@ -12,14 +11,12 @@ def thres_extrema(x, y, thresh):
 
 
 def compute_std(dat):
-    s = bark.stream.read(dat)
-    std = np.zeros(len(s.attrs['columns']))
-    for i, x in enumerate(bark.stream.read(dat)):
-        std += np.std(x, 0)
-    return std / (i + 1)
+    # read from the dataset's statistics sidecar, computed on first use
+    return bark.read_sampled(dat).stats().std()
 
 
 def spikes(data, start_sample, threshs, pad_len, order):
+    from scipy.signal import argrelextrema
     for col_i in range(data.shape[1]):
         column = data[:, col_i]
         rel_extremes, = argrelextrema(
@@ -51,19 +48,19 @@ def main(dat, csv, thresh, is_std, order=default_order, min_dist=0):
         n_channels = bark.read_sampled(dat).data.shape[1]
         threshs = np.ones(n_channels) * thresh
     print('thresholds:', threshs)
-    s = bark.stream.read(dat)
+    from bark import stream
+    s = stream.read(dat)
     pad_len = order
-    with open(csv, 'w') as fp:
-        fp.write('channel,start\n')
+    with bark.EventWriter(csv,
+                          fields=('channel', 'start'),
+                          datatype=1000,
+                          columns={'channel': {'units': None},
+                                   'start': {'units': 's'}},
+                          thresholds=threshs,
+                          order=order,
+                          source=dat) as writer:
         for (channel, sample) in stream_spikes(s, threshs, pad_len, order, min_dist * s.sr):
-            fp.write('{},{}\n'.format(channel, sample / s.sr))
-    bark.write_metadata(csv,
-                        datatype=1000,
-                        columns={'channel': {'units': None},
-                                 'start': {'units', 's'}},
-                        thresholds=threshs,
-                        order=order,
-                        source=dat)
+            writer.writerow((channel, sample / s.sr))
 
 
 def _run():
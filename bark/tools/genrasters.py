@@ -1,12 +1,8 @@
 import argparse
 import bark
 import collections as coll
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import numpy as np
 import os
-import scipy.io.wavfile
 import sys
 
 # plot styling constants
@@ -30,8 +26,11 @@ def pad_stimulus(stim, padding):
        stim     --  Stimulus object
        padding  --  2-tuple, in seconds, of before and after padding
     """
+    data = np.asarray(stim.data)
+    if data.ndim > 1:  # datasets are (samples, channels): use the first
+        data = data[:, 0]
     extended = [0]*sec2samp(padding[0], stim.sampling_rate)
-    extended.extend(stim.data)
+    extended.extend(data)
     extended.extend([0]*sec2samp(padding[1], stim.sampling_rate))
     return Stimulus(stim.name, extended, stim.sampling_rate)
 
@@ -45,8 +44,12 @@ def aligned_raster(spikes, stim_ds, stim_name, padding, title, stim_data):
        title       --  string
        stim_data   --  Stimulus object, or None
     """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
     f = plt.figure()
     offset = 0
+    spikes = np.sort(np.asarray(spikes, dtype=float))
     stim_events = stim_ds[stim_ds['name'] == stim_name]
     if stim_events.empty:
         msg = 'stimulus "{}" not found in {}'
@@ -59,7 +62,9 @@ def aligned_raster(spikes, stim_ds, stim_name, padding, title, stim_data):
         start = stim_event.start - padding[0]
         stop = stim_event.stop + padding[1]
         offset -= OFFSET_STEP
-        curr_spks = [s - start for s in spikes if s >= start and s <= stop]
+        lo = np.searchsorted(spikes, start, 'left')
+        hi = np.searchsorted(spikes, stop, 'right')
+        curr_spks = list(spikes[lo:hi] - start)
         if stim_data is not None:
             curr_spks = [sec2samp(s, stim_data.sampling_rate)
                          for s in curr_spks]
@@ -103,16 +108,19 @@ def _parse_args(raw_args):
     return parser.parse_args(raw_args)
 
 def _main():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
     args = _parse_args(sys.argv[1:])
     spike_ds = bark.read_events(args.spikes)
     stim_time_ds = bark.read_events(args.stimtimes)
     if args.stim:
         if os.path.splitext(args.stim)[-1] == '.wav':
-            sr, stim = scipy.io.wavfile.read(args.stim)
-            stimulus = Stimulus(args.name, stim, sr)
+            from bark.io.wav import read_wav
+            stim = read_wav(args.stim)
         else:
             stim = bark.read_sampled(args.stim)
-            stimulus = Stimulus(args.name, stim.data, stim.sampling_rate)
+        stimulus = Stimulus(args.name, stim.data, stim.sampling_rate)
     else:
         stimulus = None
     title_str = '"{}"-aligned spike raster, unit {}'
@@ -1,16 +1,12 @@
 import os
 import sys
 import string
-import yaml
 import numpy as np
-from scipy.signal import spectrogram
-import matplotlib.pyplot as plt
 import bark
 from bark.io.eventops import (OpStack, write_stack, read_stack, Update, Merge,
                               Split, Delete, New)
 import warnings
 warnings.filterwarnings('ignore')  # suppress matplotlib warnings
-from bark.tools.spectral import BarkSpectra
 
 
 help_string = '''
@@ -120,6 +116,8 @@ def plot_spectrogram(data,
     derivative: if True, plots the spectral derivative, SAP style
 
     '''
+    import matplotlib.pyplot as plt
+    from bark.tools.spectral import BarkSpectra
     nfft = int(ms_nfft / 1000. * sr)
     start_samp = int(start * sr) - nfft // 2
     if start_samp < 0:
@@ -186,6 +184,7 @@ class SegmentReviewer:
         self.spec_ax = spec_ax
         self.map_ax = map_ax
         self.data = sampled.data.ravel()
+        self.pyramid = sampled.pyramid()
         self.sr = sampled.sampling_rate
         self.label_attrs = out_attrs
         self.opstack = opstack
@@ -223,6 +222,7 @@ class SegmentReviewer:
         self.osc_ax.figure.tight_layout()
 
     def initialize_minimap(self):
+        import matplotlib.pyplot as plt
         times, values = labels_to_scatter_coords(self.opstack.events)
         self.map_ax.set_axis_bgcolor('k')
         self.map_ax.scatter(times,
@@ -278,6 +278,7 @@ class SegmentReviewer:
     def update_plot_data(self):
         'updates plot data on all three axes'
         if not self.opstack.events:
+            import matplotlib.pyplot as plt
             print('no segments')
             plt.close("all")
             return
@@ -323,17 +324,14 @@ class SegmentReviewer:
                          ax=self.spec_ax)
 
     def update_oscillogram(self):
-        x = self.data[self.buffer_start_samp:self.buffer_stop_samp]
-        t = np.arange(len(x)) / self.sr + self.buf_start
-        if len(x) > 10000:
-            t_interp = np.linspace(self.buf_start, self.buf_stop, 10000)
-            x_interp = np.interp(t_interp, t, x)
-        else:
-            t_interp = t
-            x_interp = x
-        self.osc_line.set_data(t_interp, x_interp)
+        # draw the min/max envelope, with at least one bin per pixel
+        width = int(self.osc_ax.bbox.width)
+        samples, mins, maxs = self.pyramid.sample_envelope(
+            self.buffer_start_samp, self.buffer_stop_samp, width, channels=0)
+        self.osc_line.set_data(np.repeat(samples / self.sr, 2),
+                               np.column_stack((mins, maxs)).ravel())
         self.osc_ax.set_xlim(self.buf_start, self.buf_stop)
-        self.osc_ax.set_ylim(min(x), max(x))
+        self.osc_ax.set_ylim(mins.min(), maxs.max())
 
     def connect(self):
         'creates all the event connections'
@@ -457,9 +455,12 @@ class SegmentReviewer:
 
     def save(self):
         'Writes out labels to file.'
-        from pandas import DataFrame
-        label_data = DataFrame(self.opstack.events)
-        bark.write_events(self.outfile, label_data, **self.label_attrs)
+        attrs = dict(self.label_attrs)
+        attrs.pop('format', None)
+        attrs['columns'] = bark.bark._strip_categories(attrs['columns'])
+        with bark.EventWriter(self.outfile, fields=list(attrs['columns']),
+                              **attrs) as writer:
+            writer.writerows(self.opstack.events)
         print(self.outfile, 'written')
         if self.opsfile:
             write_stack(self.opsfile, self.opstack)
@@ -477,6 +478,7 @@ def build_shortcut_map(mapfile=None):
     shortcut_map = {x: x for x in allkeys}
     # load keys from file
     if mapfile:
+        import yaml
         custom = {str(key): value
                   for key, value in yaml.load(open(mapfile, 'r')).items()}
         print('custom keymaps:', custom)
@@ -518,6 +520,7 @@ def load_opstack(opsfile, labelfile, labeldata, use_ops):
 
 
 def main(datfile, labelfile, outfile=None, shortcutfile=None, use_ops=True):
+    import matplotlib.pyplot as plt
     if not labelfile:
         labelfile = os.path.splitext(datfile)[0] + '.csv'
     kill_shortcuts(plt)
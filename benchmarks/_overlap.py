@@ -0,0 +1,17 @@
+"""
+Filter overlap for the benchmarks that filter streams in overlapping windows.
+"""
+import numpy as np
+
+
+def filter_overlap(b, a, tol=1e-9):
+    """Samples for the impulse response of filter (b, a) to decay below tol,
+    the context needed to filter a chunk as if it were part of the whole."""
+    a = np.atleast_1d(a)
+    poles = np.roots(a) if len(a) > 1 else []
+    radius = np.max(np.abs(poles)) if len(poles) else 0
+    if radius == 0:  # FIR
+        return len(np.atleast_1d(b))
+    if radius >= 1:
+        raise ValueError('unstable filter')
+    return len(np.atleast_1d(b)) + int(np.ceil(np.log(tol) / np.log(radius)))
@@ -0,0 +1,57 @@
+"""
+Benchmark: compressed versus raw sampled data.
+
+Writes a synthetic multichannel recording (a random walk, like slowly varying
+voltages) raw and with each codec, and reports the compression ratio, the
+write time, the time to stream through the whole dataset and the time to read
+short slices at random positions.
+
+    python benchmarks/bench_compressed.py [n_samples] [n_channels]
+"""
+import os
+import sys
+import tempfile
+import timeit
+import numpy as np
+import bark
+from bark import stream
+
+
+def recording(n_samples, n_channels, seed=0):
+    rng = np.random.RandomState(seed)
+    steps = rng.randint(-20, 21, size=(n_samples, n_channels))
+    return np.cumsum(steps, axis=0).astype('int16')
+
+
+def random_slices(data, n=200, length=3000, seed=1):
+    starts = np.random.RandomState(seed).randint(0, len(data) - length, n)
+    for start in starts:
+        np.array(data[start:start + length])
+
+
+def main(n_samples=2000000, n_channels=64, repeat=3):
+    data = recording(n_samples, n_channels)
+    print('{} samples x {} channels, {:.0f} MB'.format(
+        n_samples, n_channels, data.nbytes / 2**20))
+    print('{:8s} {:>8s} {:>10s} {:>10s} {:>10s}'.format(
+        'codec', 'ratio', 'write s', 'stream s', 'slices s'))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for codec in (None, 'zlib', 'lzma', 'bz2'):
+            path = os.path.join(tmpdir, '{}.dat'.format(codec))
+            t_write = min(timeit.repeat(
+                lambda: bark.write_sampled(path, data, 30000,
+                                           compression=codec),
+                number=1, repeat=1))
+            ratio = data.nbytes / os.path.getsize(path)
+            dset = bark.read_sampled(path)
+            t_stream = min(timeit.repeat(
+                lambda: [x.max() for x in stream.read(path)],
+                number=1, repeat=repeat))
+            t_slices = min(timeit.repeat(lambda: random_slices(dset.data),
+                                         number=1, repeat=repeat))
+            print('{:8s} {:8.2f} {:10.3f} {:10.3f} {:10.3f}'.format(
+                str(codec), ratio, t_write, t_stream, t_slices))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
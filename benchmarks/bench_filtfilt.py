@@ -0,0 +1,42 @@
+"""
+Benchmark: zero-phase filtering of a stream, by overlapping windows and in
+two passes.
+
+Times Stream.filtfilt, which now filters forward to a temporary file and
+then backward from its end, against the previous approach of running
+scipy's filtfilt on each chunk with enough overlap for the filter to
+settle. Also reports the largest difference of each from filtfilt on the
+whole array.
+
+    python benchmarks/bench_filtfilt.py [n_samples] [n_channels]
+"""
+import sys
+import timeit
+import numpy as np
+from scipy.signal import butter, filtfilt
+from bark.stream import Stream
+from _overlap import filter_overlap
+
+
+def main(n_samples=4000000, n_channels=4, chunksize=500000, repeat=3):
+    data = np.random.RandomState(0).randn(n_samples, n_channels)
+    b, a = butter(3, (300 / 15000, 6000 / 15000), 'bandpass')
+    exact = filtfilt(b, a, data, axis=0)
+    overlap = filter_overlap(b, a) + 3 * max(len(a), len(b))
+    cases = (
+        ('overlap', lambda: Stream(data, sr=30000, chunksize=chunksize)
+         .vector_map(lambda x: filtfilt(b, a, x, axis=0), overlap)),
+        ('two pass', lambda: Stream(data, sr=30000, chunksize=chunksize)
+         .filtfilt(b, a)))
+    print('{} samples x {} channels, chunks of {}'.format(
+        n_samples, n_channels, chunksize))
+    print('{:10s} {:>10s} {:>12s}'.format('', 'seconds', 'max error'))
+    for name, make in cases:
+        seconds = min(timeit.repeat(lambda: make().call(), number=1,
+                                    repeat=repeat))
+        error = np.abs(make().call() - exact).max()
+        print('{:10s} {:10.3f} {:12.3g}'.format(name, seconds, error))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,39 @@
+"""
+Benchmark: reading one channel from interleaved and channel-major datasets.
+
+Writes the same recording in both layouts, then times copying out a single
+channel, and a per-channel reduction over all channels, from each.
+
+    python benchmarks/bench_layout.py [n_samples] [n_channels]
+"""
+import os
+import sys
+import tempfile
+import timeit
+import numpy as np
+import bark
+
+
+def main(n_samples=2000000, n_channels=64, repeat=3):
+    data = np.random.RandomState(0).randint(
+        -1000, 1000, (n_samples, n_channels)).astype('int16')
+    print('{} samples x {} channels, {:.0f} MB'.format(
+        n_samples, n_channels, data.nbytes / 2**20))
+    print('{:14s} {:>12s} {:>14s}'.format('layout', 'channel s',
+                                          'all channels s'))
+    channel = n_channels // 2
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for layout in (bark.INTERLEAVED, bark.CHANNEL_MAJOR):
+            path = os.path.join(tmpdir, layout + '.dat')
+            bark.write_sampled(path, data, 30000, layout=layout)
+            x = bark.read_sampled(path).data
+            t_one = min(timeit.repeat(lambda: np.array(x[:, channel]),
+                                      number=1, repeat=repeat))
+            t_all = min(timeit.repeat(
+                lambda: [np.abs(x[:, i]).max() for i in range(n_channels)],
+                number=1, repeat=repeat))
+            print('{:14s} {:12.4f} {:14.4f}'.format(layout, t_one, t_all))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,67 @@
+"""
+Benchmark: parsing and writing large meta files.
+
+Compares the pure-Python PyYAML loader/dumper with the libyaml C versions
+that bark uses when available, on a meta file shaped like an Intan amplifier
+dataset (one column per channel, each with the full channel description).
+
+    python benchmarks/bench_metadata.py [n_channels]
+"""
+import os
+import sys
+import tempfile
+import timeit
+import yaml
+import bark
+
+
+def amplifier_columns(n_channels):
+    return {i: {'native_channel_name': 'A-{:03d}'.format(i),
+                'custom_channel_name': 'A-{:03d}'.format(i),
+                'native_order': i,
+                'custom_order': i,
+                'board_stream': 0,
+                'chip_channel': i % 32,
+                'port_name': 'Port A',
+                'port_prefix': 'A',
+                'port_number': 1,
+                'electrode_impedance_magnitude': 123456.7,
+                'electrode_impedance_phase': -45.6,
+                'units': 'uV',
+                'unit_scale': 0.195}
+            for i in range(n_channels)}
+
+
+def main(n_channels=384, repeat=5):
+    attrs = dict(sampling_rate=30000, dtype='<i2',
+                 columns=amplifier_columns(n_channels))
+    with tempfile.TemporaryDirectory() as tmp:
+        datfile = os.path.join(tmp, 'amplifier.dat')
+        open(datfile, 'wb').close()
+        bark.write_metadata(datfile, **attrs)
+        text = open(datfile + '.meta.yaml').read()
+        print('{} channels, {} lines of YAML'.format(n_channels,
+                                                     text.count('\n')))
+        print('libyaml available: {}'.format(yaml.__with_libyaml__))
+        loaders = [('SafeLoader', yaml.SafeLoader)]
+        dumpers = [('SafeDumper', yaml.SafeDumper)]
+        if yaml.__with_libyaml__:
+            loaders.append(('CSafeLoader', yaml.CSafeLoader))
+            dumpers.append(('CSafeDumper', yaml.CSafeDumper))
+        for name, loader in loaders:
+            t = min(timeit.repeat(lambda: yaml.load(text, Loader=loader),
+                                  number=1, repeat=repeat))
+            print('load  {:<12} {:8.2f} ms'.format(name, t * 1e3))
+        for name, dumper in dumpers:
+            t = min(timeit.repeat(
+                lambda: yaml.dump(attrs, Dumper=dumper,
+                                  default_flow_style=False),
+                number=1, repeat=repeat))
+            print('dump  {:<12} {:8.2f} ms'.format(name, t * 1e3))
+        t = min(timeit.repeat(lambda: bark.read_metadata(datfile),
+                              number=1, repeat=repeat))
+        print('bark.read_metadata  {:8.2f} ms'.format(t * 1e3))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
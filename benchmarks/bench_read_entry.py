@@ -0,0 +1,54 @@
+"""
+Benchmark: reading and sorting the entries of a large Root.
+
+Creates a Root with thousands of entries, then times `read_entry` on all of
+them and sorting them by timestamp, along with the timestamp parsing that
+`Entry` construction does (Arrow versus the memoized fast path).
+
+    python benchmarks/bench_read_entry.py [n_entries]
+"""
+import datetime
+import os
+import sys
+import tempfile
+import timeit
+import arrow
+import bark
+
+
+def main(n_entries=5000, repeat=3):
+    with tempfile.TemporaryDirectory() as root_path:
+        start = datetime.datetime(2017, 3, 1, 10)
+        for i in range(n_entries):
+            bark.create_entry(os.path.join(root_path, 'e{:05d}'.format(i)),
+                              start + datetime.timedelta(minutes=i))
+        names = [os.path.join(root_path, x) for x in os.listdir(root_path)]
+        stamps = [bark.read_metadata(x)['timestamp'] for x in names]
+        print('{} entries'.format(n_entries))
+
+        t = min(timeit.repeat(lambda: [arrow.get(x).datetime for x in stamps],
+                              number=1, repeat=repeat))
+        print('parse timestamps, arrow         {:8.2f} ms'.format(t * 1e3))
+
+        def cold():
+            bark.bark._parse_timestamp.cache_clear()
+            [bark.timestamp_to_datetime(x) for x in stamps]
+        t = min(timeit.repeat(cold, number=1, repeat=repeat))
+        print('parse timestamps, fromisoformat {:8.2f} ms'.format(t * 1e3))
+        t = min(timeit.repeat(
+            lambda: [bark.timestamp_to_datetime(x) for x in stamps],
+            number=1, repeat=repeat))
+        print('parse timestamps, memoized      {:8.2f} ms'.format(t * 1e3))
+
+        bark.bark._parse_timestamp.cache_clear()
+        t = min(timeit.repeat(lambda: [bark.read_entry(x) for x in names],
+                              number=1, repeat=repeat))
+        print('read_entry, all entries         {:8.2f} ms'.format(t * 1e3))
+        entries = [bark.read_entry(x) for x in names]
+        t = min(timeit.repeat(lambda: sorted(entries), number=1,
+                              repeat=repeat))
+        print('sort entries                    {:8.2f} ms'.format(t * 1e3))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
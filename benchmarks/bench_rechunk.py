@@ -0,0 +1,54 @@
+"""
+Benchmark: rechunking streams.
+
+Times `bark.stream.rechunk` against the previous implementation, which
+stacked every incoming chunk onto the leftover buffer, from tiny input chunks
+to a large output size, from huge input chunks to a small output size, and
+between sizes that line up.
+
+    python benchmarks/bench_rechunk.py [n_samples] [n_channels]
+"""
+import sys
+import timeit
+import numpy as np
+from bark.stream import rechunk
+
+
+def vstack_rechunk(stream, chunksize):
+    "The previous implementation, for comparison."
+    buffer = None
+    for x in stream:
+        if buffer is None:
+            buffer = x
+        else:
+            buffer = np.vstack((buffer, x))
+        while len(buffer) > chunksize:
+            yield buffer[:chunksize, :]
+            buffer = buffer[chunksize:, :]
+    yield buffer
+
+
+def chunks(data, size):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+def main(n_samples=2000000, n_channels=8, repeat=3):
+    data = np.zeros((n_samples, n_channels), dtype='int16')
+    print('{} samples x {} channels'.format(n_samples, n_channels))
+    print('{:>10s} {:>10s} {:>12s} {:>12s}'.format('in', 'out', 'vstack s',
+                                                   'rechunk s'))
+    cases = ((64, 100000), (1000, 100000), (1000000, 1000),
+             (1000000, 50000), (100000, 50000))
+    for size_in, size_out in cases:
+        times = []
+        for func in (vstack_rechunk, rechunk):
+            times.append(min(timeit.repeat(
+                lambda: sum(len(x) for x in func(chunks(data, size_in),
+                                                 size_out)),
+                number=1, repeat=repeat)))
+        print('{:10d} {:10d} {:12.4f} {:12.4f}'.format(size_in, size_out,
+                                                       *times))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
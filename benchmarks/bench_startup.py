@@ -0,0 +1,56 @@
+"""
+Benchmark: cold start time of the console scripts.
+
+Each entry point listed in setup.py is imported in a fresh interpreter, the
+way a shell script starts, and the best wall-clock time of several runs is
+reported next to the time for a bare interpreter. Entry points whose
+optional dependencies are not installed are reported as unavailable.
+
+    python benchmarks/bench_startup.py [repeat]
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+SETUP = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                     'setup.py')
+
+
+def entry_points():
+    "Returns (script, module, function) for each console script."
+    with open(SETUP) as fp:
+        text = fp.read()
+    return re.findall(r"'([\w-]+)=([\w.]+):(\w+)'", text)
+
+
+def startup(code, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-c', code],
+                              stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+        t = time.perf_counter() - t0
+        if proc.returncode != 0:
+            return None
+        best = t if best is None else min(best, t)
+    return best
+
+
+def main(repeat=5):
+    t = startup('pass', repeat)
+    print('{:32s} {:8.1f} ms'.format('(python)', t * 1e3))
+    t = startup('import bark', repeat)
+    print('{:32s} {:8.1f} ms'.format('(import bark)', t * 1e3))
+    for script, module, func in entry_points():
+        t = startup('import {0}; {0}.{1}'.format(module, func), repeat)
+        if t is None:
+            print('{:32s} unavailable'.format(script))
+        else:
+            print('{:32s} {:8.1f} ms'.format(script, t * 1e3))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,40 @@
+"""
+Benchmark: Stream filters with and without an explicit overlap.
+
+Times zero-phase filtering, forward filtering and median filtering of a
+synthetic recording through `vector_map` with the overlap each filter
+needs, against the previous behaviour of filtering every pair of chunks.
+
+    python benchmarks/bench_vector_map.py [n_samples] [n_channels]
+"""
+import sys
+import timeit
+import numpy as np
+from scipy.signal import butter, filtfilt, lfilter, medfilt2d
+from bark.stream import Stream
+from _overlap import filter_overlap
+
+
+def main(n_samples=4000000, n_channels=4, chunksize=500000, repeat=3):
+    data = np.random.RandomState(0).randn(n_samples, n_channels)
+    b, a = butter(3, (300 / 15000, 6000 / 15000), 'bandpass')
+    cases = (
+        ('filtfilt', lambda x: filtfilt(b, a, x, axis=0),
+         filter_overlap(b, a) + 3 * max(len(a), len(b))),
+        ('lfilter', lambda x: lfilter(b, a, x, axis=0), filter_overlap(b, a)),
+        ('medfilt', lambda x: medfilt2d(x, (5, 1)), 2))
+    print('{} samples x {} channels, chunks of {}'.format(
+        n_samples, n_channels, chunksize))
+    print('{:10s} {:>10s} {:>10s} {:>8s}'.format('', 'pairs s', 'overlap s',
+                                                'speedup'))
+    for name, func, overlap in cases:
+        times = [min(timeit.repeat(
+            lambda: Stream(data, sr=30000, chunksize=chunksize)
+            .vector_map(func, overlap=o).call(), number=1, repeat=repeat))
+            for o in (None, overlap)]
+        print('{:10s} {:10.3f} {:10.3f} {:8.2f}'.format(
+            name, times[0], times[1], times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -19,10 +19,12 @@ setup(name='bark',
               'bark-attribute=bark.tools.barkutils:meta_attr',
               'bark-column-attribute=bark.tools.barkutils:meta_column_attr',
               'bark-clean-orphan-metas=bark.tools.barkutils:clean_metafiles',
+              'bark-events-convert=bark.tools.barkutils:_events_convert',
               'bark-scope=bark.tools.barkscope:main',
               'csv-from-waveclus=bark.io.waveclus:_waveclus2csv',
               'csv-from-textgrid=bark.io.textgrid:textgrid2csv',
               'csv-from-lbl=bark.io.lbl:_lbl_csv',
+              'dat-from-wav=bark.io.wav:_wav_meta',
               'csv-from-plexon-csv=bark.io.plexon:_plexon_csv_to_bark_csv',
               'bark-convert-rhd=bark.io.rhd.rhd2bark:bark_rhd_to_entry',
               'bark-convert-openephys=bark.io.openephys.kwik2dat:kwd_to_entry',
@@ -33,6 +35,9 @@ setup(name='bark',
               'dat-resample=bark.tools.barkutils:rb_resample',
               'dat-select=bark.tools.barkutils:rb_select',
               'dat-cat=bark.tools.barkutils:rb_concat',
+              'dat-compress=bark.tools.barkutils:rb_compress',
+              'dat-decompress=bark.tools.barkutils:rb_decompress',
+              'dat-layout=bark.tools.barkutils:rb_layout',
               'dat-join=bark.tools.barkutils:rb_join',
               'dat-segment=bark.tools.datsegment:_run',
               'dat-filter=bark.tools.barkutils:rb_filter',
@@ -121,3 +121,682 @@ def test_datatypes():
     assert bark.DATATYPES.code_to_name[1] == 'ACOUSTIC'
     assert bark.DATATYPES.code_to_name[2002] == 'COMPONENTL'
     assert bark.DATATYPES.code_to_name[None] is None
+
+
+def test_root_index(tmpdir, monkeypatch):
+    root_path = tmpdir.strpath
+    for name in ('a', 'b'):
+        entry = bark.create_entry(os.path.join(root_path, name),
+                                  datetime.datetime(2020, 1, 1), food=name)
+        bark.write_sampled(os.path.join(entry.path, 'x.dat'),
+                           np.zeros((10, 2), dtype='int16'), 100)
+    root = bark.read_root(root_path, index=True)
+    assert sorted(root.entries) == ['a', 'b']
+    assert root['a'].attrs['food'] == 'a'
+    assert root['b']['x.dat'].sampling_rate == 100
+    root.index.close()
+    assert os.path.exists(os.path.join(root_path, '.bark-index.sqlite'))
+    # a warm index serves unchanged metadata without parsing
+    real_load = bark.bark._load_metafile
+    def fail(metafile):
+        raise AssertionError('parsed ' + metafile)
+    monkeypatch.setattr(bark.bark, '_load_metafile', fail)
+    root = bark.read_root(root_path, index=True)
+    assert root['a'].attrs['food'] == 'a'
+    assert root['b']['x.dat'].data.shape == (10, 2)
+    # changed metadata is re-parsed
+    monkeypatch.setattr(bark.bark, '_load_metafile', real_load)
+    attrs = bark.read_metadata(os.path.join(root_path, 'a'))
+    attrs['food'] = 'a different food'
+    bark.write_metadata(os.path.join(root_path, 'a'), **attrs)
+    root = bark.read_root(root_path, index=True)
+    assert root['a'].attrs['food'] == 'a different food'
+
+
+def test_root_index_unwritable(tmpdir):
+    from bark.index import MetaIndex
+    root_path = tmpdir.strpath
+    bark.create_entry(os.path.join(root_path, 'a'),
+                      datetime.datetime(2020, 1, 1), food='a')
+    # an index file that cannot be created, as in a read-only Root
+    index = MetaIndex(root_path, os.path.join('missing', 'index.sqlite'))
+    root = bark.read_root(root_path, index=index)
+    assert root['a'].attrs['food'] == 'a'
+    assert len(index) > 0
+    index.close()
+
+
+def test_root_index_corrupt(tmpdir, monkeypatch):
+    root_path = tmpdir.strpath
+    bark.create_entry(os.path.join(root_path, 'a'),
+                      datetime.datetime(2020, 1, 1), food='a')
+    with open(os.path.join(root_path, '.bark-index.sqlite'), 'wb') as fp:
+        fp.write(b'not a database' * 100)
+    root = bark.read_root(root_path, index=True)
+    assert root['a'].attrs['food'] == 'a'
+    root.index.close()
+    # the corrupt file was replaced by a working index
+    def fail(metafile):
+        raise AssertionError('parsed ' + metafile)
+    monkeypatch.setattr(bark.bark, '_load_metafile', fail)
+    root = bark.read_root(root_path, index=True)
+    assert root['a'].attrs['food'] == 'a'
+
+
+def test_read_root_workers(tmpdir):
+    root_path = tmpdir.strpath
+    for i in range(8):
+        entry = bark.create_entry(os.path.join(root_path, str(i)),
+                                  datetime.datetime(2020, 1, 1 + i))
+        bark.write_sampled(os.path.join(entry.path, 'x.dat'),
+                           np.zeros((10, 2), dtype='int16'), 100 + i)
+    os.mkdir(os.path.join(root_path, 'not_an_entry.'))
+    root = bark.read_root(root_path, workers=4)
+    assert len(root) == 8
+    for i in range(8):
+        # loaded eagerly, without waiting for the first access
+        entry = dict.__getitem__(root.entries, str(i))
+        assert isinstance(entry, bark.Entry)
+        assert dict.__getitem__(entry.datasets, 'x.dat').keywords['attrs'][
+            'sampling_rate'] == 100 + i
+        assert entry['x.dat'].sampling_rate == 100 + i
+
+
+def test_metadata_pure_python_yaml(tmpdir, monkeypatch):
+    import yaml
+    path = os.path.join(tmpdir.strpath, 'test_sampled')
+    columns = {i: {'units': 'uV', 'unit_scale': 0.195, 'name': 'A-%d' % i}
+               for i in range(64)}
+    bark.write_sampled(path, np.zeros((10, 64), dtype='int16'), 30000,
+                       columns=columns)
+    fast = bark.read_metadata(path)
+    # PyYAML built without libyaml
+    monkeypatch.setattr(bark.bark, '_yaml_loader', lambda: yaml.SafeLoader)
+    monkeypatch.setattr(bark.bark, '_yaml_dumper', lambda: yaml.SafeDumper)
+    assert bark.read_metadata(path) == fast
+    bark.write_metadata(path, **fast)
+    assert bark.read_metadata(path) == fast
+    assert fast['columns'] == columns
+
+
+def test_compact_columns(tmpdir):
+    path = os.path.join(tmpdir.strpath, 'test_sampled')
+    columns = bark.sampled_columns(np.zeros((1, 4)), compact=True)
+    assert isinstance(columns, bark.Columns)
+    assert columns == {i: {'units': None} for i in range(4)}
+    bark.write_sampled(path, np.zeros((10, 4), dtype='int16'), 100,
+                       columns=columns)
+    assert 'fields:' in open(path + '.meta.yaml').read()
+    attrs = bark.read_metadata(path)
+    cols = attrs['columns']
+    assert isinstance(cols, bark.Columns)
+    assert len(cols) == 4 and 3 in cols and 4 not in cols
+    cols[0]['units'] = 'V'
+    bark.write_metadata(path, **attrs)
+    assert bark.read_metadata(path)['columns'][0]['units'] == 'V'
+    assert bark.read_metadata(path)['columns'][3]['units'] is None
+    # a field added to one column is missing, not None, in the others,
+    # and the table is written as a dictionary of dictionaries
+    cols[2]['name'] = 'mic'
+    assert cols[2] == {'units': None, 'name': 'mic'}
+    assert 'name' not in cols[0]
+    bark.write_metadata(path, **attrs)
+    assert not bark.Columns.is_encoded(
+        bark.bark._load_metafile(path + '.meta.yaml')['columns'])
+    assert bark.read_metadata(path)['columns'] == cols
+    table = bark.Columns(range(3), {'units': ['uV'] * 3, 'gain': [1, 2, 3]})
+    assert table.take([2, 0])[0] == {'units': 'uV', 'gain': 3}
+    both = bark.Columns.concat(table, table.take([1]))
+    assert list(both) == [0, 1, 2, 3]
+    assert both[3]['gain'] == 2
+
+
+def test_timestamp_to_datetime_strings():
+    for string in ('2020-01-02T03:04:05+06:00',
+                   '2017-02-27T11:03:21.095541-06:00',
+                   '2020-01-02T03:04:05',
+                   '2020-01-02',
+                   '2020-01-02T03:04:05Z',
+                   '20200102T030405-0600'):
+        expected = arrow.get(string).datetime
+        dt = bark.timestamp_to_datetime(string)
+        assert dt == expected
+        assert dt.utcoffset() == expected.utcoffset()
+    naive = datetime.datetime(2020, 1, 1)
+    assert (bark.convert_timestamp(naive, 'America/Chicago') ==
+            arrow.get(naive, 'America/Chicago').isoformat())
+    with pytest.raises(ValueError):
+        bark.convert_timestamp(naive, 'Not/A_Timezone')
+
+
+def test_import_is_lazy():
+    import subprocess
+    import sys
+    code = ('import sys, bark; '
+            'print(" ".join(m for m in ("numpy", "yaml", "arrow", "pandas") '
+            'if m in sys.modules))')
+    out = subprocess.check_output([sys.executable, '-c', code])
+    assert out.decode().strip() == ''
+
+
+def test_dataset_cache(tmpdir):
+    from bark.cache import DatasetCache
+    root_path = tmpdir.strpath
+    for i in range(3):
+        entry = bark.create_entry(os.path.join(root_path, str(i)),
+                                  datetime.datetime(2020, 1, 1 + i))
+        bark.write_sampled(os.path.join(entry.path, 'x.dat'),
+                           np.zeros((10, 2), dtype='int16'), 100)
+        bark.write_events(os.path.join(entry.path, 'e.csv'),
+                          pd.DataFrame({'start': [0.5], 'name': ['a']}),
+                          columns={'start': {'units': 's'},
+                                   'name': {'units': None}})
+    cache = DatasetCache(max_memmaps=2, max_event_bytes=None, max_items=None)
+    root = bark.read_root(root_path, cache=cache)
+    first = root['0']['x.dat']
+    assert root['0']['x.dat'] is first
+    assert cache.info()[:3] == (1, 1, 0)
+    root['1']['x.dat']
+    root['2']['x.dat']
+    assert cache.memmaps == 2 and cache.evictions == 1
+    assert os.path.join(root['0'].path, 'x.dat') not in cache
+    # evicted datasets are transparently read again
+    assert root['0']['x.dat'] is not first
+    assert root['0']['x.dat'].data.shape == (10, 2)
+    root['0']['e.csv']
+    assert cache.event_bytes > 0
+    cache.max_items = 1
+    root['1']['e.csv']
+    assert len(cache) == 1 and cache.memmaps == 0
+    # compressed datasets hold their files open too
+    from bark.cache import _footprint
+    path = os.path.join(root['0'].path, 'z.dat')
+    assert _footprint(bark.write_sampled(path, np.zeros((10, 2), 'int16'),
+                                         100, compression='zlib')) == (1, 0)
+
+
+def test_root_query(tmpdir):
+    root_path = tmpdir.strpath
+    start = arrow.get('2017-03-01T10:00:00-06:00').datetime
+    # hour-long entries every two hours, one without sampled data
+    for i in range(6):
+        entry = bark.create_entry(os.path.join(root_path, str(i)),
+                                  start + datetime.timedelta(hours=2 * i))
+        if i != 3:
+            bark.write_sampled(os.path.join(entry.path, 'x.dat'),
+                               np.zeros((3600, 2), dtype='int16'), 1)
+    root = bark.read_root(root_path)
+    assert root.time_index.max_duration == 3600
+
+    def names(t0, t1):
+        return [e.name for e in root.query(t0, t1)]
+    assert names(start, start + datetime.timedelta(hours=12)) == [
+        '0', '1', '2', '3', '4', '5']
+    assert names('2017-03-01T10:30:00-06:00', '2017-03-01T12:00:00-06:00') == [
+        '0']
+    assert names('2017-03-01T11:00:00-06:00', '2017-03-01T12:00:00-06:00') == []
+    assert names('2017-03-01T11:30:00-06:00', '2017-03-01T16:30:00-06:00') == [
+        '1', '2', '3']
+    # naive times use the same default timezone as create_entry
+    assert names(datetime.datetime(2017, 3, 1, 12, 30),
+                 datetime.datetime(2017, 3, 1, 12, 45)) == ['1']
+
+
+def test_sampled_time_slice(tmpdir):
+    path = os.path.join(tmpdir.strpath, 'test_sampled')
+    data = np.arange(200, dtype='int16').reshape(-1, 2)
+    # a chunk that starts 10 samples into the entry, as written by dat-split
+    dset = bark.write_sampled(path, data, 10, offset=10)
+    assert np.array_equal(dset.time_slice(2, 3), data[10:20])
+    assert np.shares_memory(dset.time_slice(2, 3), dset.data)
+    assert np.array_equal(dset.time_slice(0, 1.5, channels=1), data[:5, 1])
+    assert dset.time_slice(20, 30).shape == (0, 2)
+    assert np.array_equal(dset.window(1.5, 0.5), data[5:10])
+    # equally spaced windows are a strided view
+    w = dset.windows([1, 2, 3], 0.5)
+    assert w.shape == (3, 5, 2)
+    assert np.shares_memory(w, dset.data)
+    for i, t in enumerate([1, 2, 3]):
+        assert np.array_equal(w[i], dset.window(t, 0.5))
+    w = dset.windows([1, 1.3, 3], 0.5, channels=0)
+    assert w.shape == (3, 5)
+    assert np.array_equal(w[1], data[3:8, 0])
+    assert dset.windows([], 0.5).shape == (0, 5, 2)
+    with pytest.raises(IndexError):
+        dset.windows([10.5], 1)
+
+
+def test_write_sampled_blocks(tmpdir, monkeypatch):
+    path = os.path.join(tmpdir.strpath, 'test_sampled')
+    data = np.arange(30, dtype='int16').reshape(-1, 3)
+    # arrays are copied in blocks of at most WRITE_BLOCK_BYTES
+    monkeypatch.setattr(bark.bark, 'WRITE_BLOCK_BYTES', 8)
+    dset = bark.write_sampled(path, data, 10, units='mV')
+    assert np.array_equal(dset.data, data)
+    assert dset.attrs['dtype'] == '<i2' and dset.attrs['units'] == 'mV'
+    # as are iterators of blocks
+    dset = bark.write_sampled(path, (data[i:i + 4] for i in range(0, 10, 4)),
+                              10)
+    assert np.array_equal(bark.read_sampled(path).data, data)
+    assert len(dset.attrs['columns']) == 3
+    with bark.SampledWriter(path, 10, append=True, trial=2) as writer:
+        writer.write(data[:2])
+        writer.write(data[2:5].astype('float64'))
+    dset = writer.close()
+    assert dset.attrs['dtype'] == '<i2' and dset.attrs['trial'] == 2
+    assert np.array_equal(dset.data, np.vstack((data, data[:5])))
+    with pytest.raises(ValueError):
+        bark.SampledWriter(path, 10, dtype='float32', append=True)
+    with pytest.raises(ValueError):  # blocks of other channels
+        with bark.SampledWriter(path, 10, append=True) as writer:
+            writer.write(data[:5, :2])
+    assert np.array_equal(bark.read_sampled(path).data,
+                          np.vstack((data, data[:5])))
+    # an error leaves no meta file
+    path = os.path.join(tmpdir.strpath, 'failed')
+    with pytest.raises(RuntimeError):
+        with bark.SampledWriter(path, 10) as writer:
+            writer.write(data)
+            raise RuntimeError
+    assert not os.path.exists(path + '.meta.yaml')
+
+
+def test_npy_events(tmpdir):
+    from bark.tools.barkutils import events_convert
+    path = os.path.join(tmpdir.strpath, 'test_events.npy')
+    data = pd.DataFrame({'start': [0.5, 1.5, 2.5], 'channel': [3, 1, 2],
+                         'name': ['a', 'b', None]})
+    events = bark.write_events(path, data, format='npy',
+                               columns={'start': {'units': 's'},
+                                        'channel': {'units': None},
+                                        'name': {'units': None}})
+    assert events.attrs['format'] == 'npy'
+    assert events.attrs['columns']['name']['categories'] == ['a', 'b', '']
+    events = bark.read_dataset(path)
+    assert isinstance(events, bark.EventData)
+    assert list(events.data.columns) == ['start', 'channel', 'name']
+    assert events.data.channel.dtype == np.int64
+    assert list(events.data.name) == ['a', 'b', '']
+    # rewriting keeps the format
+    events.write()
+    assert bark.read_events(path).attrs['format'] == 'npy'
+    csv = events_convert(path, os.path.join(tmpdir.strpath, 'test.csv'))
+    assert 'format' not in csv.attrs
+    assert 'categories' not in csv.attrs['columns']['name']
+    assert open(csv.path).readline().strip() == 'start,channel,name'
+    back = events_convert(csv.path, os.path.join(tmpdir.strpath, 'back.npy'))
+    assert back.data.equals(events.data)
+    with pytest.raises(ValueError):
+        bark.write_events(path, data, format='hdf5')
+
+
+def test_read_events_typed(tmpdir):
+    path = os.path.join(tmpdir.strpath, 'test_events.csv')
+    with open(path, 'w') as fp:
+        fp.write('start,stop,name,channel\n1,2,a,1\n3,4,,2\n')
+    bark.write_metadata(path, columns={
+        'start': {'units': 's'},
+        'stop': {'units': 's'},
+        'name': {'units': None},
+        'channel': {'units': None, 'dtype': 'int16'}})
+    data = bark.read_events(path).data
+    assert data.start.dtype == np.float64 and data.stop.dtype == np.float64
+    assert data.channel.dtype == np.int16
+    assert list(data.name) == ['a', '']
+    # categorical string columns are filled too
+    bark.write_metadata(path, columns={
+        'start': {'units': 's'},
+        'stop': {'units': 's'},
+        'name': {'units': None, 'dtype': 'category'},
+        'channel': {'units': None}})
+    data = bark.read_events(path).data
+    assert data.name.dtype == 'category' and list(data.name) == ['a', '']
+
+
+def test_event_writer(tmpdir):
+    path = os.path.join(tmpdir.strpath, 'test_events.csv')
+    columns = {'start': {'units': 's'}, 'name': {'units': None}}
+    with bark.EventWriter(path, fields=('start', 'name'), batch_size=2,
+                          columns=columns, creator='me') as writer:
+        writer.writerow((0.5, 'a'))
+        writer.writerows([{'name': 'b', 'start': 1.5}, (2.5, 'c')])
+        writer.write(pd.DataFrame({'name': ['d'], 'start': [3.5]}))
+    assert writer.n_rows == 4
+    events = bark.read_events(path)
+    assert list(events.data.columns) == ['start', 'name']
+    assert list(events.data.name) == ['a', 'b', 'c', 'd']
+    assert events.attrs['creator'] == 'me'
+    with bark.EventWriter(path, append=True) as writer:
+        writer.write({'start': [4.5], 'name': ['e']})
+    events = bark.read_events(path)
+    assert list(events.data.start) == [0.5, 1.5, 2.5, 3.5, 4.5]
+    assert events.attrs['creator'] == 'me'
+    # npy files are written in batches too
+    path = os.path.join(tmpdir.strpath, 'test_events.npy')
+    with bark.EventWriter(path, format='npy', batch_size=2,
+                          columns=columns) as writer:
+        writer.writerows({'start': t, 'name': n}
+                         for t, n in [(0.5, 'a'), (1.5, 'b'), (2.5, 'a')])
+    events = bark.read_events(path)
+    assert events.attrs['columns']['name']['categories'] == ['a', 'b']
+    assert list(events.data.name) == ['a', 'b', 'a']
+    assert np.array_equal(np.load(path)['start'], [0.5, 1.5, 2.5])
+    with pytest.raises(ValueError):
+        bark.EventWriter(path, append=True)
+    # no events
+    with bark.EventWriter(path, format='npy', columns=columns):
+        pass
+    assert len(bark.read_events(path).data) == 0
+    assert bark.read_events(path).data.start.dtype == np.float64
+
+
+def test_events_between(tmpdir):
+    path = os.path.join(tmpdir.strpath, 'test_events.csv')
+    data = pd.DataFrame({'start': [3., 1., 2., 5., 4.],
+                         'stop': [3.5, 1.5, 4.5, 5.5, 4.5],
+                         'name': ['c', 'a', 'b', 'e', 'd']})
+    events = bark.write_events(path, data)
+    assert list(events.between(2, 4).name) == ['b', 'c', 'd']
+    assert list(events.between(4.1, 4.9).name) == []
+    assert list(events.between(4.1, 4.9, overlap=True).name) == ['b', 'd']
+    windows = events.between_many([0, 1.5, 10], [1, 3, 11])
+    assert [list(x.name) for x in windows] == [['a'], ['b', 'c'], []]
+    # the sort order is kept in a sidecar
+    events.save_index()
+    assert os.path.exists(path + '.order.npy')
+    events = bark.read_events(path)
+    assert events._load_index(5) is not None
+    assert list(events.between(2, 4).name) == ['b', 'c', 'd']
+    # sorted events need no index
+    events = bark.write_events(path, data.sort_values('start'))
+    assert list(events.between(1, 2).name) == ['a', 'b']
+    assert events._sorted()[1] is None
+
+
+def test_compressed_sampled(tmpdir):
+    from bark.compressed import CompressedArray
+    from bark import stream
+    path = os.path.join(tmpdir.strpath, 'test_sampled.dat')
+    rng = np.random.RandomState(0)
+    data = np.cumsum(rng.randint(-50, 50, (1000, 3)), axis=0).astype('int16')
+    data[500] = [32767, -32768, 0]  # delta coding wraps around
+    for codec in ('zlib', 'lzma', 'bz2'):
+        dset = bark.write_sampled(path, data, 100, compression=codec,
+                                  units='uV')
+        assert dset.attrs['compression']['codec'] == codec
+        assert np.array_equal(np.asarray(dset.data), data)
+    dset = bark.write_sampled(
+        path, data, 100,
+        compression={'codec': 'zlib', 'block_size': 64, 'level': 1})
+    dset = bark.read_sampled(path)
+    assert isinstance(dset.data, CompressedArray)
+    assert dset.data.shape == (1000, 3) and dset.data.n_blocks == 16
+    assert os.path.getsize(path) < data.nbytes
+    assert np.array_equal(dset.data[100:300], data[100:300])
+    assert np.array_equal(dset.data[-10:], data[-10:])
+    assert np.array_equal(dset.data[999:0:-7, 1], data[999:0:-7, 1])
+    assert np.array_equal(dset.data[5], data[5])
+    assert np.array_equal(dset.data[[900, 3, 64]], data[[900, 3, 64]])
+    assert np.array_equal(dset.time_slice(1, 2, channels=0), data[100:200, 0])
+    assert np.array_equal(dset.windows([1, 5], 0.5), np.stack(
+        (data[100:150], data[500:550])))
+    assert bark.bark._sampled_length(path, dset.attrs) == 1000
+    assert [len(x) for x in stream.read(path, chunksize=300)] == [300, 300, 300, 100]
+    assert np.array_equal(stream.read(path, chunksize=300).call(), data)
+    # rewriting keeps the compression, floats are not delta coded
+    dset.write(os.path.join(tmpdir.strpath, 'copy.dat'))
+    copy = bark.read_sampled(os.path.join(tmpdir.strpath, 'copy.dat'))
+    assert copy.attrs['compression']['block_size'] == 64
+    dset = bark.write_sampled(path, data / 3., 100, compression='zlib')
+    assert not dset.attrs['compression']['delta']
+    assert np.array_equal(dset.data[:], data / 3.)
+    with pytest.raises(ValueError):
+        bark.read_sampled(path, mode='r+')
+
+
+def test_virtual_concat(tmpdir):
+    from bark.concat import ConcatArray, concatenate
+    from bark import stream
+    rng = np.random.RandomState(0)
+    parts = [rng.randint(-100, 100, (n, 2)).astype('int16')
+             for n in (100, 50, 120)]
+    paths = []
+    for i, part in enumerate(parts):
+        paths.append(os.path.join(tmpdir.strpath, 'day{}.dat'.format(i)))
+        bark.write_sampled(paths[-1], part, 10, units='uV')
+    data = np.concatenate(parts)
+    path = os.path.join(tmpdir.strpath, 'all.dat')
+    dset = concatenate(path, paths[:2], trial=1)
+    assert os.path.getsize(path) == 0
+    assert dset.attrs['members'] == [{'path': 'day0.dat', 'start': 0},
+                                     {'path': 'day1.dat', 'start': 100}]
+    # extending a virtual dataset flattens its members
+    concatenate(path, [path, paths[2]])
+    dset = bark.read_sampled(path)
+    assert isinstance(dset.data, ConcatArray)
+    assert dset.data.shape == (270, 2)
+    assert bark.bark._sampled_length(path, dset.attrs) == 270
+    view = dset.data[110:140]
+    assert isinstance(view, np.memmap)  # not copied
+    assert np.array_equal(view, data[110:140])
+    assert np.array_equal(dset.data[90:160, 1], data[90:160, 1])
+    assert np.array_equal(dset.data[260:20:-9], data[260:20:-9])
+    assert np.array_equal(dset.data[-1], data[-1])
+    assert np.array_equal(dset.data[[149, 0, 150]], data[[149, 0, 150]])
+    assert np.array_equal(dset.time_slice(9, 11), data[90:110])
+    assert [len(x) for x in stream.read(path, chunksize=100)] == [100, 100, 70]
+    assert np.array_equal(stream.read(path, chunksize=64).call(), data)
+    # copying materializes the data
+    dset.write(os.path.join(tmpdir.strpath, 'copy.dat'))
+    copy = bark.read_sampled(os.path.join(tmpdir.strpath, 'copy.dat'))
+    assert 'members' not in copy.attrs
+    assert np.array_equal(copy.data, data)
+    bark.write_sampled(paths[0], parts[0][:90], 10, units='uV')
+    with pytest.raises(ValueError):
+        bark.read_sampled(path)
+    bark.write_sampled(paths[0], parts[0].astype('int32'), 10, units='uV')
+    with pytest.raises(ValueError):
+        concatenate(path, paths)
+
+
+def test_channel_major_layout(tmpdir):
+    from bark import stream
+    path = os.path.join(tmpdir.strpath, 'test_sampled.dat')
+    data = np.arange(40, dtype='int16').reshape(10, 4)
+    dset = bark.write_sampled(path, data, 10, layout=bark.CHANNEL_MAJOR)
+    assert dset.attrs['layout'] == 'channel-major'
+    raw = np.fromfile(path, dtype='int16')
+    assert np.array_equal(raw, data.T.ravel())
+    dset = bark.read_sampled(path)
+    assert dset.data.shape == (10, 4)
+    assert np.array_equal(dset.data, data)
+    assert dset.data[:, 2].flags['C_CONTIGUOUS']
+    assert np.array_equal(dset.windows([0.1, 0.3], 0.2), np.stack(
+        (data[1:3], data[3:5])))
+    assert np.array_equal(stream.read(path, chunksize=3)[[1, 3]].call(),
+                          data[:, [1, 3]])
+    # from an iterator, and copied back to interleaved
+    dset = bark.write_sampled(path, (data[i:i + 4] for i in range(0, 10, 4)),
+                              10, layout=bark.CHANNEL_MAJOR)
+    assert np.array_equal(dset.data, data)
+    assert sorted(os.listdir(tmpdir.strpath)) == ['test_sampled.dat',
+                                                  'test_sampled.dat.meta.yaml']
+    copy = os.path.join(tmpdir.strpath, 'copy.dat')
+    dset.write(copy)
+    assert bark.read_sampled(copy).attrs['layout'] == 'channel-major'
+    stream.read(path).write(copy)
+    assert 'layout' not in bark.read_metadata(copy)
+    assert np.array_equal(np.fromfile(copy, dtype='int16'), data.ravel())
+    with pytest.raises(ValueError):
+        bark.SampledWriter(copy, 10, layout=bark.CHANNEL_MAJOR)
+    with pytest.raises(ValueError):
+        bark.write_sampled(copy, data, 10, layout='diagonal')
+    # a partial frame means the channels are misaligned
+    with open(path, 'ab') as fp:
+        fp.write(b'\x00\x00')
+    with pytest.raises(ValueError):
+        bark.read_sampled(path)
+
+
+def test_sampled_stats(tmpdir):
+    from bark.stats import read_stats
+    path = os.path.join(tmpdir.strpath, 'test_sampled.dat')
+    rng = np.random.RandomState(0)
+    data = rng.randint(-1000, 1000, (200000, 3)).astype('int16')
+    dset = bark.write_sampled(path, data[:150000], 100)
+    stats = dset.stats()
+    assert os.path.exists(path + '.stats.npz')
+    assert np.allclose(stats.mean(), data[:150000].mean(0))
+    assert np.allclose(stats.std(10, 140000), data[10:140000].std(0))
+    assert np.array_equal(stats.max(70000, 70005), data[70000:70005].max(0))
+    assert np.all(np.isnan(stats.mean(5, 5)))
+    assert np.array_equal(stats.min(), data[:150000].min(0))
+    assert np.array_equal(stats.hist.sum(1), [150000] * 3)
+    # appending extends the saved statistics
+    with bark.SampledWriter(path, 100, append=True) as writer:
+        writer.write(data[150000:])
+    dset = bark.read_sampled(path)
+    stats = dset.stats()
+    assert stats.n_samples == 200000
+    assert np.allclose(stats.std(), data.std(0))
+    assert np.array_equal(stats.hist.sum(1), [200000] * 3)
+    assert np.array_equal(stats.hist, read_stats(dset, save=False).hist)
+    fresh = bark.read_sampled(path).stats()
+    assert np.array_equal(fresh.count, stats.count)
+    # rewriting recomputes them
+    dset = bark.write_sampled(path, data[:1000] * 2, 100)
+    assert np.allclose(dset.stats().mean(), data[:1000].mean(0) * 2)
+    # statistics that cannot be saved are still returned
+    path = os.path.join(tmpdir.strpath, 'unsaved.dat')
+    dset = bark.write_sampled(path, data[:1000], 100)
+    os.mkdir(path + '.stats.npz.tmp')
+    assert np.allclose(dset.stats().mean(), data[:1000].mean(0))
+    assert not os.path.exists(path + '.stats.npz')
+
+
+def test_minmax_pyramid(tmpdir):
+    from bark.pyramid import level_sizes
+    path = os.path.join(tmpdir.strpath, 'test_sampled.dat')
+    rng = np.random.RandomState(0)
+    data = rng.randint(-1000, 1000, (100003, 2)).astype('int16')
+    data[54321, 1] = 5000  # a spike subsampling would miss
+    dset = bark.write_sampled(path, data, 1000, offset=1000)
+    pyramid = dset.pyramid()
+    assert os.path.exists(path + '.minmax.npy')
+    assert [len(x) for x in pyramid.levels] == level_sizes(100003)
+    assert len(pyramid.levels[0]) == 25001
+    assert np.array_equal(pyramid.levels[1][5, 0],
+                          [data[80:96, 0].min(), data[80:96, 0].max()])
+    t, mins, maxs = pyramid.envelope(1, 101, 500)
+    assert len(t) >= 500 and t[0] == 1
+    assert np.array_equal(mins.min(0), data.min(0))
+    assert maxs[:, 1].max() == 5000
+    assert np.all(mins <= maxs)
+    # short ranges come from the data
+    t, mins, maxs = pyramid.envelope(2, 2.1, 500, channels=0)
+    assert np.array_equal(mins, data[1000:1100, 0]) and len(t) == 100
+    # in samples of the dataset, as labelview uses, ignoring the offset
+    samples, mins, maxs = pyramid.sample_envelope(1000, 1100, 500, 0)
+    assert samples[0] == 1000 and np.array_equal(mins, data[1000:1100, 0])
+    samples, mins, maxs = pyramid.sample_envelope(0, 100003, 500)
+    assert samples[0] == 0 and np.array_equal(mins.min(0), data.min(0))
+    # reused, then rebuilt when the data changes
+    levels = bark.read_sampled(path).pyramid().levels
+    assert isinstance(levels[0], np.memmap)
+    dset = bark.write_sampled(path, data[:1000] * 2, 1000)
+    assert dset.pyramid().levels[0][0, 0, 1] == data[:4, 0].max() * 2
+    dset = bark.write_sampled(path, data[:100], 1000)
+    assert dset.pyramid().levels == []
+    # kept in memory if the sidecar cannot be written
+    path = os.path.join(tmpdir.strpath, 'unsaved.dat')
+    dset = bark.write_sampled(path, data, 1000)
+    os.mkdir(path + '.minmax.npy.tmp.npy')
+    levels = dset.pyramid().levels
+    assert not isinstance(levels[0], np.memmap)
+    assert levels[0][0, 0, 1] == data[:4, 0].max()
+    assert not os.path.exists(path + '.minmax.npy')
+
+
+def test_virtual_sidecars(tmpdir):
+    from bark.concat import concatenate
+    paths = [os.path.join(tmpdir.strpath, name) for name in ('a.dat', 'b.dat')]
+    data = np.arange(4000, dtype='int16').reshape(2000, 2)
+    for path in paths:
+        bark.write_sampled(path, data, 1000)
+    path = os.path.join(tmpdir.strpath, 'virtual.dat')
+    dset = concatenate(path, paths)
+    assert dset.stats().max()[0] == data[:, 0].max()
+    assert dset.pyramid().levels[-1][..., 1].max() == data.max()
+    # a member rewritten since is noticed, though the placeholder is not
+    bark.write_sampled(paths[1], data * 2, 1000)
+    earlier = os.path.getmtime(paths[1]) - 10
+    for sidecar in ('.stats.npz', '.minmax.npy'):
+        os.utime(path + sidecar, (earlier, earlier))
+    os.utime(path, (earlier - 10, earlier - 10))  # the placeholder
+    dset = bark.read_sampled(path)
+    assert dset.data_mtime == os.path.getmtime(paths[1])
+    assert dset.stats().max()[0] == data[:, 0].max() * 2
+    assert dset.pyramid().levels[-1][..., 1].max() == data.max() * 2
+
+
+def test_wav_in_place(tmpdir, monkeypatch):
+    import wave
+    from bark.io.wav import read_wav, write_wav_metadata
+    from bark import stream
+    path = os.path.join(tmpdir.strpath, 'song.wav')
+    data = np.arange(2000, dtype='<i2').reshape(1000, 2)
+    with wave.open(path, 'wb') as fp:
+        fp.setnchannels(2)
+        fp.setsampwidth(2)
+        fp.setframerate(8000)
+        fp.writeframes(data.tobytes())
+    with open(path, 'ab') as fp:  # a trailing chunk, not samples
+        fp.write(b'LIST\x04\x00\x00\x00abcd')
+    dset = read_wav(path)
+    assert isinstance(dset.data, np.memmap)
+    assert dset.sampling_rate == 8000 and np.array_equal(dset.data, data)
+    write_wav_metadata(path, trial=3)
+    dset = bark.read_sampled(path)
+    assert dset.attrs['byte_offset'] == 44 and dset.attrs['trial'] == 3
+    assert np.array_equal(dset.data, data)
+    assert bark.bark._sampled_length(path, dset.attrs) == 1000
+    assert np.array_equal(stream.read(path, chunksize=300).call(), data)
+    # from another directory, by reference
+    os.mkdir(os.path.join(tmpdir.strpath, 'entry'))
+    ref = os.path.join(tmpdir.strpath, 'entry', 'stim.dat')
+    dset = write_wav_metadata(path, ref)
+    assert dset.attrs['data_file'] == os.path.join('..', 'song.wav')
+    assert os.path.getsize(ref) == 0 and dset.data_path == path
+    assert np.array_equal(dset.data[10:20], data[10:20])
+    assert np.allclose(dset.stats().mean(), data.mean(0))
+    # copies are plain raw files
+    copy = os.path.join(tmpdir.strpath, 'copy.dat')
+    dset.write(copy)
+    assert 'byte_offset' not in bark.read_metadata(copy)
+    assert os.path.getsize(copy) == data.nbytes
+    with pytest.raises(ValueError):
+        bark.SampledWriter(ref, 8000, append=True)
+    # and the foreign file is never opened for writing
+    with pytest.raises(ValueError):
+        bark.read_sampled(ref, 'r+')
+    from bark.tools.datartifact import datartifact
+    monkeypatch.setattr('bark.tools.datartifact.make_artifact_plots',
+                        lambda *args: None)
+    datartifact(ref, copy, 0.5)
+    assert np.array_equal(read_wav(path).data, data)
+    assert 'data_file' not in bark.read_metadata(copy)
+    # stimulus datasets pad to one dimensional arrays, of the first channel
+    from bark.tools.genrasters import Stimulus, pad_stimulus
+    stim = read_wav(path)
+    padded = pad_stimulus(Stimulus('song', stim.data, 8000), (0.001, 0.001))
+    assert np.array(padded.data).shape == (1016, )
+    # formats that cannot be memory mapped are read into memory
+    path = os.path.join(tmpdir.strpath, 'song24.wav')
+    with wave.open(path, 'wb') as fp:
+        fp.setnchannels(1)
+        fp.setsampwidth(3)
+        fp.setframerate(8000)
+        fp.writeframes(b'\x00\x01\x00' * 100)
+    dset = read_wav(path)
+    assert dset.data.shape == (100, 1) and dset.sampling_rate == 8000
+    assert len(np.unique(dset.data)) == 1
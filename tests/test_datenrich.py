@@ -0,0 +1,28 @@
+import os.path
+import numpy as np
+import pandas as pd
+import bark
+from bark.tools.datenrich import datenrich
+
+
+def test_datenrich_storage(tmpdir):
+    dat = os.path.join(tmpdir.strpath, 'a.dat')
+    labels = os.path.join(tmpdir.strpath, 'a.csv')
+    out = os.path.join(tmpdir.strpath, 'b.dat')
+    data = np.arange(40000, dtype='int16').reshape(-1, 4)
+    bark.write_events(labels,
+                      pd.DataFrame({'start': [12., 40.], 'stop': [13., 41.],
+                                    'name': ['a', 'b']}),
+                      columns={'start': {'units': 's'},
+                               'stop': {'units': 's'},
+                               'name': {'units': None}})
+    # label times are relative to the entry, like the dataset's offset
+    for storage in ({}, {'layout': bark.CHANNEL_MAJOR},
+                    {'compression': 'zlib'}):
+        bark.write_sampled(dat, data, 100, offset=1000, **storage)
+        datenrich(dat, out, labels, 0.5)
+        dset = bark.read_sampled(out)
+        assert 'offset' not in dset.attrs
+        assert np.array_equal(np.asarray(dset.data),
+                              np.concatenate((data[150:350],
+                                              data[2950:3150])))
@@ -27,6 +27,18 @@ def test_stream_chunksize():
     assert eq(data1, stream.call())
 
 
+def test_stream_array_like():
+    class Chunked():
+        "Like an h5py dataset, with a chunks attribute that is not a method"
+        chunks = None
+        shape, dtype = data3.shape, data3.dtype
+
+        def __getitem__(self, key):
+            return data3[key]
+
+    assert eq(data3, Stream(Chunked(), sr=10, chunksize=7).call())
+
+
 def test_padded_chunks():
     stream = Stream(data2, sr=10, chunksize=20) # 100 x 5
     pchunks = list(stream.padded_chunks(10))
@@ -146,6 +158,76 @@ def test_filtfilt():
         assert eq(x, y)
 
 
+@pytest.mark.filterwarnings('ignore:kernel_size exceeds')
+def test_vector_map_overlap():
+    from scipy.signal import medfilt
+    # context shorter than, equal to and longer than the chunks
+    for overlap in (2, 7, 20):
+        y = Stream(data4, chunksize=7, sr=1).vector_map(
+            lambda x: medfilt(x, (2 * overlap + 1, 1)), overlap).call()
+        assert eq(medfilt(data4, (2 * overlap + 1, 1)), y)
+    # a function returning a view of its input
+    assert eq(data3, Stream(data3, chunksize=13, sr=1).vector_map(
+        lambda x: x[:], 5).call())
+    b, a = butter(2, 0.01)
+    y = Stream(data4, chunksize=1000, sr=1).filtfilt(b, a).call()
+    assert np.abs(filtfilt(b, a, data4, axis=0) - y).max() < 1e-6
+
+
+def test_stateful_filters():
+    from scipy.signal import lfilter, sosfilt
+    b, a = butter(3, 0.05)
+    for chunksize in (1, 7, 1000):
+        y = Stream(data4, chunksize=chunksize, sr=1).lfilter(b, a).call()
+        assert np.allclose(lfilter(b, a, data4, axis=0), y)
+    sos = butter(4, (0.1, 0.3), btype='bandpass', output='sos')
+    y = Stream(data4, chunksize=7, sr=1).sosfilt(sos).call()
+    assert np.allclose(sosfilt(sos, data4, axis=0), y)
+    y = Stream(data4, chunksize=7, sr=2).butter(highpass=0.1, lowpass=0.3,
+                                                order=4,
+                                                zerophase=False).call()
+    assert np.allclose(sosfilt(sos, data4, axis=0), y)
+
+
+def test_sos_filters():
+    from scipy.signal import sosfiltfilt
+    from bark.stream import filter_design, _filter_design
+    sos = filter_design('butter', 8, 0.1, 0.3, 2)
+    hits = _filter_design.cache_info().hits
+    Stream(data4, sr=2).butter(0.1, 0.3, order=8)
+    assert _filter_design.cache_info().hits == hits + 1
+    y = Stream(data4, chunksize=1000, sr=2).butter(0.1, 0.3, order=8).call()
+    assert np.abs(sosfiltfilt(sos, data4, axis=0) - y).max() < 1e-6
+    y = Stream(data4.astype(np.float32), chunksize=1000, sr=2).butter(
+        0.1, 0.3, order=8, dtype=np.float32).call()
+    assert y.dtype == np.float32
+    assert np.abs(sosfiltfilt(sos, data4, axis=0) - y).max() < 1e-5 * 11111
+    with pytest.raises(ValueError):
+        filter_design('bessel', 3, None, None, 2)
+
+
+def test_two_pass_filtfilt():
+    from scipy.signal import sosfiltfilt
+    from bark.stream import reverse_array_iterator
+    chunks = list(reverse_array_iterator(data3, 4))
+    assert eq(data3[::-1], np.vstack(chunks))
+    assert all(np.shares_memory(c, data3) for c in chunks)
+    x = np.random.RandomState(0).randn(5000, 2)
+    b, a = butter(4, 0.02)
+    sos = butter(6, (0.05, 0.2), btype='bandpass', output='sos')
+    for chunksize in (7, 100, 10000):
+        y = Stream(x, chunksize=chunksize, sr=1).filtfilt(b, a).call()
+        assert np.allclose(filtfilt(b, a, x, axis=0), y, rtol=0,
+                           atol=1e-12)
+        y = Stream(x, chunksize=chunksize, sr=1).sosfiltfilt(sos).call()
+        assert np.allclose(sosfiltfilt(sos, x, axis=0), y, rtol=0,
+                           atol=1e-12)
+    y = Stream(data4, chunksize=100, sr=1).filtfilt(b, a).call()
+    assert np.allclose(filtfilt(b, a, data4.astype(float), axis=0), y)
+    with pytest.raises(ValueError):
+        Stream(data1, sr=1).filtfilt(b, a).call()
+
+
 def test_convolve():
     win = [.1, 0, 3]
     for data in (data2, data3, data4):
@@ -272,3 +354,33 @@ def test_write_read(tmpdir):
     assert eq(data1, b.call())
     for key in attrs:
         assert attrs[key] == b.attrs[key]
+
+
+def test_split_merge_compact_columns():
+    columns = bark.Columns(range(5), {'units': [None] * 5,
+                                      'name': [str(i) for i in range(5)]})
+    s = Stream(data2, sr=1, attrs={'columns': columns}).split(1, 3)
+    assert isinstance(s.attrs['columns'], bark.Columns)
+    assert s.attrs['columns'][1]['name'] == '3'
+    s2 = Stream(data2, sr=1, attrs={'columns': columns})[0]
+    merged = s.merge(s2)
+    assert isinstance(merged.attrs['columns'], bark.Columns)
+    assert [merged.attrs['columns'][i]['name'] for i in range(3)] == \
+        ['1', '3', '0']
+    assert eq(data2[:, (1, 3, 0)], merged.call())
+
+
+def test_rechunk_views():
+    from bark.stream import rechunk
+    chunks = list(rechunk(iter([data2[:20], data2[20:27], data2[27:]]), 10))
+    assert [len(x) for x in chunks] == [10] * 10
+    assert np.shares_memory(chunks[0], data2)  # not copied
+    assert not np.shares_memory(chunks[2], data2)  # spans two inputs
+    assert eq(np.vstack(chunks), data2)
+    # tiny chunks, mixed types
+    tiny = [data2[i:i + 3] for i in range(0, 100, 3)]
+    tiny[5] = tiny[5] / 2
+    chunks = list(rechunk(iter(tiny), 7))
+    assert [len(x) for x in chunks] == [7] * 14 + [2]
+    assert eq(np.vstack(chunks), np.vstack(tiny))
+    assert list(rechunk(iter([]), 5)) == []